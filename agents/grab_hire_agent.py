@@ -1,29 +1,35 @@
 import json 
-import re
-import os
-from typing import Dict, Any, List
-from langchain.agents import AgentExecutor, create_openai_functions_agent
+import secrets
+from typing import Dict, Any, List, Tuple
 from langchain.tools import BaseTool
-from langchain.prompts import ChatPromptTemplate
-import PyPDF2
+from utils.pdf_rules import load_agent_rules
+from utils.rules_prompt import build_rules_prompt
+from utils.agent_executor import get_agent_executor
+from utils.serialization import dumps
+from utils.customer_details import extract_customer_details
+from utils.keyword_matcher import KeywordMatcher
+from utils.batching import map_batch, amap_batch
+from config.settings import settings
 
-class GrabHireAgent:
-    def __init__(self, llm, tools: List[BaseTool]):
-        self.llm = llm
-        self.tools = tools
-        
-        # Direct PDF import from data/rules/all_rules.pdf
-        pdf_rules = self._load_pdf_rules()
+# Per-call trace output and agent verbosity - only when LOG_LEVEL=DEBUG
+DEBUG = settings.DEBUG
 
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", f"""You are the WasteKing Grab Hire specialist - friendly, British, and GET PRICING NOW!
+# Keyword table scanned once per message - materials in reporting order, plus booking intent
+_KEYWORD_MATCHER = KeywordMatcher(
+    [(material, 'material') for material in (
+        'soil', 'muck', 'rubble', 'concrete', 'brick', 'sand', 'gravel',
+        'construction', 'building', 'demolition', 'household', 'office',
+        'garden', 'wood', 'metal', 'general'
+    )]
+    + [('book', 'booking')],
+    cache_size=4096
+)
+
+_GRAB_SYSTEM_PROMPT = """You are the WasteKing Grab Hire specialist - friendly, British, and GET PRICING NOW!
 
 IMPORTANT ROUTING: You handle ALL waste services EXCEPT "mav" (man and van) and "skip" (skip hire).
 This includes: grab hire, general waste, large items, heavy materials, construction waste, garden waste, office clearance, etc.
 
-RULES FROM PDF KNOWLEDGE BASE:
-{pdf_rules}
-
 CRITICAL API PARAMETERS:
 - service: "grab" (for grab hire) or determine appropriate service
 - postcode: Clean format (no spaces for API)
@@ -38,68 +44,85 @@ PERSONALITY:
 - Start with: "Alright love!" or "Right then!"
 - Get pricing first, then book if customer confirms
 
-Follow PDF rules above. Get pricing fast."""),
-            ("human", """Customer: {input}
+Follow PDF rules above. Get pricing fast.
+
+INSTRUCTION: If customer has all info and says "book", call create_booking_quote immediately."""
 
-Extracted data: {extracted_info}
+_GRAB_HUMAN_TEMPLATE = """Customer: {input}
 
-INSTRUCTION: If customer has all info and says "book", call create_booking_quote immediately."""),
-            ("placeholder", "{agent_scratchpad}")
-        ])
-        
-        self.agent = create_openai_functions_agent(
-            llm=self.llm,
-            tools=self.tools,
-            prompt=self.prompt
-        )
-        
-        self.executor = AgentExecutor(
-            agent=self.agent,
-            tools=self.tools,
-            verbose=True,
-            max_iterations=10
-        )
+Extracted data (JSON): {extracted_info}"""
+_ERROR_REPLY = "Right then! I need your postcode and what type of materials you have. What's your postcode?"
+
+class GrabHireAgent:
+    __slots__ = ('llm', 'tools', '_tools_by_name', 'prompt', 'agent', 'executor')
     
-    def _load_pdf_rules(self) -> str:
-        """Load rules directly from data/rules/all rules.pdf"""
-        try:
-            pdf_path = "data/rules/all rules.pdf"
-            print(f"🔧 GRAB AGENT: Loading PDF rules from: {pdf_path}")
-            if os.path.exists(pdf_path):
-                with open(pdf_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    for page in pdf_reader.pages:
-                        text += page.extract_text()
-                print(f"🔧 GRAB AGENT: PDF rules loaded successfully ({len(text)} characters)")
-                return text
-            else:
-                print(f"❌ GRAB AGENT: PDF rules not found at {pdf_path}")
-                return "PDF rules not found - using basic grab hire rules"
-        except Exception as e:
-            print(f"❌ GRAB AGENT: Error loading PDF rules: {e}")
-            return "PDF rules not available - using basic grab hire rules"
+    def __init__(self, llm, tools: List[BaseTool]):
+        self.llm = llm
+        self.tools = tools
+        self._tools_by_name = {tool.name: tool for tool in tools}
+        
+        # Direct PDF import from data/rules/all_rules.pdf
+        pdf_rules = load_agent_rules("GRAB AGENT", "grab hire")
+
+        self.prompt = build_rules_prompt(pdf_rules, _GRAB_SYSTEM_PROMPT, _GRAB_HUMAN_TEMPLATE)
+        
+        self.agent, self.executor = get_agent_executor(self.llm, self.tools, self.prompt, max_iterations=10, verbose=DEBUG)
     
     def process_message(self, message: str, context: Dict = None) -> str:
         """Process with proper data extraction"""
+        reply, action, agent_input = self._plan_turn(message, context)
+        if reply is not None:
+            return reply
         
-        extracted_data = self._extract_data_properly(message, context)
+        try:
+            self._trace_execution(action)
+            response = self.executor.invoke(agent_input)
+            if DEBUG:
+                print(f"🔧 GRAB AGENT: Agent execution completed successfully")
+            return response["output"]
+        except Exception as e:
+            print(f"❌ Grab Agent Error: {str(e)}")
+            return _ERROR_REPLY
+    
+    async def aprocess_message(self, message: str, context: Dict = None) -> str:
+        """Async process_message - the agent runs via ainvoke, so concurrent conversations share one event loop"""
+        reply, action, agent_input = self._plan_turn(message, context)
+        if reply is not None:
+            return reply
         
-        print(f"🔧 GRAB DATA: {json.dumps(extracted_data, indent=2)}")
+        try:
+            self._trace_execution(action)
+            response = await self.executor.ainvoke(agent_input)
+            if DEBUG:
+                print(f"🔧 GRAB AGENT: Agent execution completed successfully")
+            return response["output"]
+        except Exception as e:
+            print(f"❌ Grab Agent Error: {str(e)}")
+            return _ERROR_REPLY
+    
+    def _plan_turn(self, message: str, context: Dict = None) -> Tuple[str, str, Dict[str, Any]]:
+        """Extract this turn's data and pick the action.
+        Returns (reply, None, None) when no agent call is needed, else (None, action, agent_input)."""
+        keyword_hits = _KEYWORD_MATCHER.matches(message.lower())
+        extracted_data = self._extract_data_properly(message, context, keyword_hits)
+        
+        if DEBUG:
+            print(f"🔧 GRAB DATA: {json.dumps(extracted_data, indent=2)}")
         
         postcode = extracted_data.get('postcode')
         materials = extracted_data.get('material_type')
         has_name = bool(extracted_data.get('firstName'))
         has_phone = bool(extracted_data.get('phone'))
         
-        wants_booking = 'book' in message.lower()
+        wants_booking = any(tag == 'booking' for _, tag in keyword_hits)
         has_all_info = postcode and materials and has_name and has_phone
         
-        print(f"🎯 DECISION:")
-        print(f"   - Wants booking: {wants_booking}")
-        print(f"   - Has all info: {has_all_info}")
-        print(f"   - Name: {extracted_data.get('firstName')}")
-        print(f"   - Phone: {extracted_data.get('phone')}")
+        if DEBUG:
+            print(f"🎯 DECISION:")
+            print(f"   - Wants booking: {wants_booking}")
+            print(f"   - Has all info: {has_all_info}")
+            print(f"   - Name: {extracted_data.get('firstName')}")
+            print(f"   - Phone: {extracted_data.get('phone')}")
         
         if wants_booking and has_all_info:
             action = "create_booking_quote"
@@ -109,24 +132,22 @@ INSTRUCTION: If customer has all info and says "book", call create_booking_quote
             print(f"🔧 GETTING PRICING FIRST")
         else:
             if not postcode:
-                return "Right then! What's your postcode?"
+                return "Right then! What's your postcode?", None, None
             if not materials:
-                return "What materials need collecting?"
-            return "Let me get you a grab hire quote."
-        
-        extracted_info = f"""
-Postcode: {postcode}
-Material Type: {materials}
-Service: grab
-Customer Name: {extracted_data.get('firstName', 'NOT PROVIDED')}
-Customer Phone: {extracted_data.get('phone', 'NOT PROVIDED')}
-Action: {action}
-Ready for API: True
-"""
+                return "What materials need collecting?", None, None
+            return "Let me get you a grab hire quote.", None, None
+        
+        extracted_info = dumps({
+            "postcode": postcode,
+            "material_type": materials,
+            "service": "grab",
+            "firstName": extracted_data.get('firstName'),
+            "phone": extracted_data.get('phone'),
+            "action": action
+        })
         
         if action == "create_booking_quote":
-            import uuid
-            extracted_data['booking_ref'] = str(uuid.uuid4())
+            extracted_data['booking_ref'] = secrets.token_hex(16)
         
         agent_input = {
             "input": message,
@@ -135,19 +156,25 @@ Ready for API: True
         }
         
         agent_input.update(extracted_data)
-        
-        try:
+        return None, action, agent_input
+    
+    def _trace_execution(self, action: str):
+        if DEBUG:
             print(f"🔧 GRAB AGENT: Executing agent with action: {action}")
-            print(f"🔧 GRAB AGENT: Tools available: {[tool.name for tool in self.tools]}")
-            response = self.executor.invoke(agent_input)
-            print(f"🔧 GRAB AGENT: Agent execution completed successfully")
-            return response["output"]
-        except Exception as e:
-            print(f"❌ Grab Agent Error: {str(e)}")
-            return "Right then! I need your postcode and what type of materials you have. What's your postcode?"
+            print(f"🔧 GRAB AGENT: Tools available: {list(self._tools_by_name)}")
+    
+    def process_batch(self, items: List[Tuple[str, Dict]]) -> List[str]:
+        """Grab turns from unrelated conversations, run side by side - replies keep input order"""
+        return map_batch(self.process_message, items, settings.AGENT_CONCURRENCY_LIMIT)
     
-    def _extract_data_properly(self, message: str, context: Dict = None) -> Dict[str, Any]:
+    async def run_batch_async(self, items: List[Tuple[str, Dict]]) -> List[str]:
+        """Async process_batch"""
+        return await amap_batch(self.aprocess_message, items, settings.AGENT_CONCURRENCY_LIMIT)
+    
+    def _extract_data_properly(self, message: str, context: Dict = None, keyword_hits: List = None) -> Dict[str, Any]:
         """Proper data extraction that actually works"""
+        if keyword_hits is None:
+            keyword_hits = _KEYWORD_MATCHER.matches(message.lower())
         data = {}
         
         if context:
@@ -155,59 +182,9 @@ Ready for API: True
                 if context.get(key):
                     data[key] = context[key]
         
-        postcode_patterns = [
-            r'\b([A-Z]{1,2}\d{1,2}[A-Z]?\d[A-Z]{2})\b',
-            r'M1\s*1AB|M11AB',
-        ]
-        for pattern in postcode_patterns:
-            matches = re.findall(pattern, message.upper())
-            for match in matches:
-                clean = match.strip().replace(' ', '')
-                if len(clean) >= 5:
-                    data['postcode'] = clean
-                    print(f"✅ FOUND POSTCODE: {clean}")
-                    break
-        
-        name_patterns = [
-            r'[Nn]ame\s+(\w+\s+\w+)',
-            r'[Nn]ame\s+(\w+)',
-            r'my name is (\w+)',
-            r'i\'m (\w+)',
-            r'call me (\w+)'
-        ]
-        for pattern in name_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                name = match.group(1).strip().title()
-                data['firstName'] = name
-                print(f"✅ FOUND NAME: {name}")
-                break
-        
-        phone_patterns = [
-            r'payment link to (\d{11})',
-            r'link to (\d{11})',
-            r'to (\d{11})',
-            r'\b(07\d{9})\b',
-            r'\b(\d{11})\b'
-        ]
-        for pattern in phone_patterns:
-            match = re.search(pattern, message)
-            if match:
-                phone = match.group(1)
-                data['phone'] = phone
-                print(f"✅ FOUND PHONE: {phone}")
-                break
-        
-        materials = [
-            'soil', 'muck', 'rubble', 'concrete', 'brick', 'sand', 'gravel',
-            'construction', 'building', 'demolition', 'household', 'office', 
-            'garden', 'wood', 'metal', 'general'
-        ]
-        found = []
-        message_lower = message.lower()
-        for material in materials:
-            if material in message_lower:
-                found.append(material)
+        extract_customer_details(message, data)
+        
+        found = [keyword for keyword, tag in keyword_hits if tag == 'material']
         if found:
             data['material_type'] = ', '.join(found)
             print(f"✅ FOUND MATERIALS: {data['material_type']}")
@@ -1,25 +1,22 @@
-import json 
 import re
-import os
-from typing import Dict, Any, List
-from langchain.agents import AgentExecutor, create_openai_functions_agent
+from typing import Dict, Any, List, Tuple
 from langchain.tools import BaseTool
-from langchain.prompts import ChatPromptTemplate
-import PyPDF2
+from utils.pdf_rules import load_agent_rules
+from utils.rules_prompt import build_rules_prompt
+from utils.agent_executor import get_agent_executor
+from utils.keyword_matcher import KeywordMatcher
+from utils.batching import map_batch, amap_batch
+from config.settings import settings
 
-class ManVanAgent:
-    def __init__(self, llm, tools: List[BaseTool]):
-        self.llm = llm
-        self.tools = tools
-        
-        # Direct PDF import from data/rules/all rules.pdf
-        pdf_rules = self._load_pdf_rules()
-        
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", f"""You are a Man & Van agent with STRICT RULES.
+# Postcode pattern - compiled once at import
+_POSTCODE_RE = re.compile(r'([A-Z]{1,2}\d{1,4}[A-Z]?\d?[A-Z]{0,2})', re.IGNORECASE)  # matched as typed, uppercased after
+# Item keywords scanned in one pass, reported in this order
+_ITEM_MATCHER = KeywordMatcher(
+    (item, 'item') for item in ('bags', 'furniture', 'sofa', 'chair', 'table', 'bed', 'mattress', 'books', 'clothes', 'boxes',
+                                'appliances', 'fridge', 'freezer', 'brick', 'bricks', 'mortar', 'concrete', 'soil', 'tiles')
+)
 
-RULES FROM PDF KNOWLEDGE BASE:
-{pdf_rules}
+_MAV_SYSTEM_PROMPT = """You are a Man & Van agent with STRICT RULES.
 
 HEAVY ITEMS RULE:
 Man & Van CANNOT handle: bricks, mortar, concrete, soil, tiles, construction waste, industrial waste
@@ -36,43 +33,50 @@ Missing data → Ask once
 
 Be direct. YOU decide based on rules. NEVER GIVE FAKE PRICES!
 
-CRITICAL: Call smp_api with service="mav" when you have postcode + suitable items."""),
-            ("human", """Customer: {input}
+CRITICAL: Call smp_api with service="mav" when you have postcode + suitable items.
+
+CONTEXT DATA in the customer message is already known - DON'T ASK FOR THIS AGAIN.
+Don't ask for data you already have!"""
+
+_MAV_HUMAN_TEMPLATE = """Customer: {input}
 
-CONTEXT DATA (DON'T ASK FOR THIS AGAIN):
+CONTEXT DATA:
 Postcode: {postcode}
 Items: {items}
 Name: {name}
-Phone: {phone}
+Phone: {phone}"""
 
-Don't ask for data you already have!"""),
-            ("placeholder", "{agent_scratchpad}")
-        ])
-        
-        self.agent = create_openai_functions_agent(llm=self.llm, tools=self.tools, prompt=self.prompt)
-        self.executor = AgentExecutor(agent=self.agent, tools=self.tools, verbose=True, max_iterations=2)
+class ManVanAgent:
+    __slots__ = ('llm', 'tools', '_tools_by_name', 'prompt', 'agent', 'executor')
     
-    def _load_pdf_rules(self) -> str:
-        """Load rules directly from data/rules/all rules.pdf"""
-        try:
-            pdf_path = "data/rules/all rules.pdf"
-            print(f"🔧 MAN & VAN AGENT: Loading PDF rules from: {pdf_path}")
-            if os.path.exists(pdf_path):
-                with open(pdf_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    for page in pdf_reader.pages:
-                        text += page.extract_text()
-                print(f"🔧 MAN & VAN AGENT: PDF rules loaded successfully ({len(text)} characters)")
-                return text
-            else:
-                print(f"❌ MAN & VAN AGENT: PDF rules not found at {pdf_path}")
-                return "PDF rules not found - using basic man & van rules"
-        except Exception as e:
-            print(f"❌ MAN & VAN AGENT: Error loading PDF rules: {e}")
-            return "PDF rules not available - using basic man & van rules"
+    def __init__(self, llm, tools: List[BaseTool]):
+        self.llm = llm
+        self.tools = tools
+        self._tools_by_name = {tool.name: tool for tool in tools}
+        
+        # Direct PDF import from data/rules/all rules.pdf
+        pdf_rules = load_agent_rules("MAN & VAN AGENT", "man & van")
+        
+        self.prompt = build_rules_prompt(pdf_rules, _MAV_SYSTEM_PROMPT, _MAV_HUMAN_TEMPLATE)
+        
+        self.agent, self.executor = get_agent_executor(self.llm, self.tools, self.prompt, max_iterations=2, verbose=True)
     
     def process_message(self, message: str, context: Dict = None) -> str:
+        agent_input = self._agent_input(message, context)
+        print(f"🔧 MAN & VAN AGENT: Executing agent")
+        response = self.executor.invoke(agent_input)
+        print(f"🔧 MAN & VAN AGENT: Agent execution completed successfully")
+        return response["output"]
+    
+    async def aprocess_message(self, message: str, context: Dict = None) -> str:
+        """Async process_message - the agent runs via ainvoke, so concurrent conversations share one event loop"""
+        agent_input = self._agent_input(message, context)
+        print(f"🔧 MAN & VAN AGENT: Executing agent")
+        response = await self.executor.ainvoke(agent_input)
+        print(f"🔧 MAN & VAN AGENT: Agent execution completed successfully")
+        return response["output"]
+    
+    def _agent_input(self, message: str, context: Dict = None) -> Dict[str, Any]:
         # Get data from context first, then message
         extracted = context.get('extracted_info', {}) if context else {}
         
@@ -84,7 +88,7 @@ Don't ask for data you already have!"""),
         print(f"🔧 MAN & VAN AGENT:")
         print(f"   📍 Postcode: {postcode}")
         print(f"   📦 Items: {items}")
-        print(f"🔧 MAN & VAN AGENT: Tools available: {[tool.name for tool in self.tools]}")
+        print(f"🔧 MAN & VAN AGENT: Tools available: {list(self._tools_by_name)}")
         
         # Let AI agent decide about heavy items based on rules, no hardcoded checks
         agent_input = {
@@ -94,21 +98,22 @@ Don't ask for data you already have!"""),
             "name": name,
             "phone": phone
         }
-        
-        print(f"🔧 MAN & VAN AGENT: Executing agent")
-        response = self.executor.invoke(agent_input)
-        print(f"🔧 MAN & VAN AGENT: Agent execution completed successfully")
-        return response["output"]
+        return agent_input
+    
+    def process_batch(self, items: List[Tuple[str, Dict]]) -> List[str]:
+        """Man & van quotes for many (message, context) turns at once, in input order"""
+        return map_batch(self.process_message, items, settings.AGENT_CONCURRENCY_LIMIT)
+    
+    async def run_batch_async(self, items: List[Tuple[str, Dict]]) -> List[str]:
+        """Async process_batch"""
+        return await amap_batch(self.aprocess_message, items, settings.AGENT_CONCURRENCY_LIMIT)
     
     def _get_postcode(self, message: str) -> str:
-        patterns = [r'([A-Z]{1,2}\d{1,4}[A-Z]?\d?[A-Z]{0,2})']
-        for pattern in patterns:
-            match = re.search(pattern, message.upper())
-            if match:
-                return match.group(1).replace(' ', '')
+        match = _POSTCODE_RE.search(message)
+        if match:
+            return match.group(1).upper().replace(' ', '')
         return ""
     
     def _get_items(self, message: str) -> str:
-        mav_items = ['bags', 'furniture', 'sofa', 'chair', 'table', 'bed', 'mattress', 'books', 'clothes', 'boxes', 'appliances', 'fridge', 'freezer', 'brick', 'bricks', 'mortar', 'concrete', 'soil', 'tiles']
-        found = [item for item in mav_items if item in message.lower()]
+        found = _ITEM_MATCHER.keywords(message.lower())
         return ', '.join(found) if found else ""
@@ -1,13 +1,94 @@
 import re
 import json
 import os
-from typing import Dict, Any, Optional
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import requests
-import uuid
+from utils.keyword_matcher import KeywordMatcher
+from utils import pricing_cache
+from utils.conversation_store import ConversationStore
+from config.settings import settings
 
-# GLOBAL STATE STORAGE - survives instance recreation  
-_GLOBAL_CONVERSATION_STATES = {}
+# Per-turn trace output - only built when LOG_LEVEL=DEBUG
+DEBUG = settings.DEBUG
+
+# GLOBAL STATE STORAGE - survives instance recreation; shared across workers when REDIS_URL is set
+_CONVERSATION_STORE = ConversationStore(
+    settings.REDIS_URL, ttl=settings.CONVERSATION_STATE_TTL, maxsize=settings.CONVERSATION_STATE_MAXSIZE
+)
+
+# Customer details extracted from messages - stored as top-level state keys
+_EXTRACTED_KEYS = ('postcode', 'firstName', 'phone', 'size', 'waste_type')
+
+# Waste types picked out of messages, reported in this order
+_WASTE_KEYWORDS = (
+    'brick', 'bricks', 'rubble', 'concrete', 'soil', 'hardcore', 'stone', 'tiles',
+    'furniture', 'sofa', 'mattress', 'household', 'domestic', 'garden', 'wood',
+    'construction', 'building', 'demolition', 'mixed', 'general'
+)
+
+# Every message keyword in one table - a single pass over the message drives
+# waste extraction, name cues, stage routing and the A5 surcharge checks
+_MESSAGE_MATCHER = KeywordMatcher(
+    [(word, 'waste') for word in _WASTE_KEYWORDS] +
+    [(word, 'accept_quotes') for word in ('yes', 'both')] +
+    [(word, 'road_placement') for word in ('road', 'street', 'outside', 'front', 'pavement')] +
+    [(word, 'complex_access') for word in ('narrow', 'difficult', 'tight', 'complex', 'restricted')] +
+    [('sunday', 'sunday')] +
+    [(word, 'booking') for word in ('book', 'yes', 'confirm', 'go ahead')] +
+    [(word, 'fridge_surcharge') for word in ('fridge', 'freezer')] +
+    [('mattress', 'mattress_surcharge')] +
+    [(word, 'furniture_surcharge') for word in ('sofa', 'upholstered', 'furniture')] +
+    [('name is', 'name_is'), ('name', 'name')],
+    cache_size=4096  # repeat turns ("yes", "book it") reuse the last scan
+)
+
+# Extraction patterns - compiled once at import
+_NAME_IS_RE = re.compile(r'name\s+is\s+([A-Z][a-z]+)', re.IGNORECASE)
+_NAME_RE = re.compile(r'name\s+([A-Z][a-z]+)', re.IGNORECASE)
+# F1 phone-confirmation fallbacks - first capitalised word, first 11-digit run
+_CAPITALISED_WORD_RE = re.compile(r'[A-Z][a-z]+')
+_ELEVEN_DIGITS_RE = re.compile(r'\d{11}')
+# Postcode and phone in one alternation - they cannot compete for characters (a postcode starts
+# with a letter, a phone needs a word boundary before its digits). The first of each wins;
+# postcodes are uppercased after matching
+_DETAILS_RE = re.compile(
+    r'(?P<postcode>[A-Z]{1,2}[0-9]{1,4}[A-Z]{0,2})'
+    r'|(?P<phone>\b(?:07\d{9}|\d{11})\b)',
+    re.IGNORECASE
+)
+# Skip sizes scanned separately - a postcode like "M12" must not swallow the digits of "12 yard".
+# When several are mentioned the first in _SIZE_PRIORITY wins
+_SIZE_RE = re.compile(r'(?P<s8>8\s*(?:yard|yd)|eight)|(?P<s12>12\s*(?:yard|yd)|twelve)|(?P<s6>6\s*(?:yard|yd)|six)|(?P<s4>4\s*(?:yard|yd)|four)')
+_SIZE_BY_GROUP = {'s8': '8yd', 's12': '12yd', 's6': '6yd', 's4': '4yd'}
+_SIZE_PRIORITY = ('s8', 's12', 's6', 's4')
+
+# Default heavy/light materials lists when the PDF does not give them
+_HEAVY_MATERIALS = ['brick', 'bricks', 'rubble', 'concrete', 'soil', 'hardcore', 'stone', 'tiles']
+_LIGHT_MATERIALS = ['furniture', 'household', 'garden', 'wood', 'bags', 'boxes']
+
+# Fixed question asked on entering each stage
+_STAGE_PROMPTS = {
+    'A3_SIZE_LOCATION': "Will the skip go on your driveway or on the road?",
+    'A4_ACCESS': "Is there easy access for our lorry to deliver the skip? Any low bridges, narrow roads, or parking restrictions?",
+    'A5_PROHIBITED': "Do you have any of these items: fridges/freezers, mattresses, or upholstered furniture/sofas?",
+    'A6_TIMING': "When do you need this delivered?",
+}
+# Question stages: stage -> (state flag set once answered, stage awaiting the answer, stage to move on to)
+_GATE_STAGES = {
+    'A3_SIZE_LOCATION': ('location_checked', 'A3_LOCATION_RESPONSE', 'A4_ACCESS'),
+    'A4_ACCESS': ('access_checked', 'A4_ACCESS_RESPONSE', 'A5_PROHIBITED'),
+    'A5_PROHIBITED': ('prohibited_checked', 'A5_PROHIBITED_RESPONSE', 'A6_TIMING'),
+}
+
+# Booking refs are random per call - under gunicorn --preload module state is created once in the
+# master and shared by every forked worker, so a pid prefix or start-time counter would repeat across workers
+_BOOKING_REF_BYTES = 8
+
+# Independent pricing lookups (skip vs man & van comparison, speculative prefetch) run side by side
+_PRICING_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='pricing')
 
 class AgentOrchestrator:
     """WORKING Orchestrator - Uses PDF extracted values, NO hardcoding"""
@@ -15,12 +96,18 @@ class AgentOrchestrator:
     def __init__(self, llm, agents):
         self.llm = llm
         self.agents = agents
-        self.koyeb_url = "https://internal-porpoise-onewebonly-1b44fcb9.koyeb.app"
-        global _GLOBAL_CONVERSATION_STATES
-        self.conversation_states = _GLOBAL_CONVERSATION_STATES
+        self.koyeb_url = os.getenv('KOYEB_URL', 'https://internal-porpoise-onewebonly-1b44fcb9.koyeb.app')  # same as SMPAPITool
+        self.conversation_states = _CONVERSATION_STORE
         
         # Load PDF rules as TEXT - NO hardcoding
         self.pdf_rules = self._load_pdf_rules_text()
+        self._pdf_surcharges: Dict[str, Optional[int]] = {}  # item name -> cost found in pdf_rules
+        self._pdf_rules_found: Dict[str, Optional[str]] = {}  # rule name -> script found in pdf_rules
+        # Heavy/light materials rules from PDF - fixed for the instance, so matched with one table
+        self._material_matcher = KeywordMatcher(
+            [(item, 'heavy') for item in self._extract_pdf_value('heavy_materials', _HEAVY_MATERIALS)]
+            + [(item, 'light') for item in self._extract_pdf_value('light_materials', _LIGHT_MATERIALS)]
+        )
         print("✅ WORKING AgentOrchestrator: PDF rules loaded, no hardcoding")
     
     def _load_pdf_rules_text(self) -> str:
@@ -73,29 +160,34 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
         """COMPLETE PDF RULES WORKFLOW - A1 through A7"""
         
         conversation_state = self._load_conversation_state(conversation_id)
-        self._extract_and_update_state(message, conversation_state, context)
-        extracted = conversation_state.get('extracted_info', {})
+        # Lowered once per turn and shared by extraction and every keyword check below
+        message_lower = message.lower()
+        keyword_hits = _MESSAGE_MATCHER.matches(message_lower)
+        self._extract_and_update_state(message, conversation_state, context, message_lower, keyword_hits)
         
         # Current stage tracking
         stage = conversation_state.get('stage', 'A1_INFO_GATHERING')
+        routing = {tag for _, tag in keyword_hits}
         
-        print(f"🎯 CURRENT STAGE: {stage}")
-        print(f"🎯 EXTRACTED DATA: {json.dumps(extracted, indent=2)}")
+        if DEBUG:
+            print(f"🎯 CURRENT STAGE: {stage}")
+            print(f"🎯 EXTRACTED DATA: {json.dumps({key: conversation_state.get(key) for key in _EXTRACTED_KEYS}, indent=2)}")
         
         # A1: INFORMATION GATHERING SEQUENCE
-        postcode = extracted.get('postcode')
-        waste_type = extracted.get('waste_type')  
-        firstName = extracted.get('firstName')
-        phone = extracted.get('phone')
-        skip_size = extracted.get('size', '8yd')
+        postcode = conversation_state.get('postcode')
+        waste_type = conversation_state.get('waste_type')  
+        firstName = conversation_state.get('firstName')
+        phone = conversation_state.get('phone')
+        skip_size = conversation_state.get('size', '8yd')
         
         # Check what we have vs what we need
-        print(f"📋 INFO CHECK:")
-        print(f"   📍 Postcode: {postcode}")
-        print(f"   📦 Waste: {waste_type}")
-        print(f"   👤 Name: {firstName}")
-        print(f"   📱 Phone: {phone}")
-        print(f"   📏 Size: {skip_size}")
+        if DEBUG:
+            print(f"📋 INFO CHECK:")
+            print(f"   📍 Postcode: {postcode}")
+            print(f"   📦 Waste: {waste_type}")
+            print(f"   👤 Name: {firstName}")
+            print(f"   📱 Phone: {phone}")
+            print(f"   📏 Size: {skip_size}")
         
         # A1: Missing basic info? Ask for it
         if not postcode:
@@ -106,38 +198,39 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
             response = "What are you going to put in the skip?"
         
         # A2: HEAVY MATERIALS CHECK & MAN & VAN SUGGESTION
-        elif stage in ['A1_INFO_GATHERING', 'A2_HEAVY_CHECK'] and waste_type:
+        elif stage in {'A1_INFO_GATHERING', 'A2_HEAVY_CHECK'} and waste_type:
             conversation_state['stage'] = 'A2_HEAVY_CHECK'
+            # Postcode + waste known: start the skip price now so the quote step finds it ready
+            self._prefetch_pricing(postcode, 'skip', skip_size)
             
-            # Get heavy materials rules from PDF
-            heavy_items = self._extract_pdf_value('heavy_materials', ['brick', 'bricks', 'rubble', 'concrete', 'soil', 'hardcore', 'stone', 'tiles'])
-            light_items = self._extract_pdf_value('light_materials', ['furniture', 'household', 'garden', 'wood', 'bags', 'boxes'])
-            
-            has_heavy = any(item in waste_type.lower() for item in heavy_items)
-            has_light_only = any(item in waste_type.lower() for item in light_items) and not has_heavy
+            # Heavy/light materials (from PDF) classified in one pass over the waste description
+            material_tags = self._material_matcher.tags(waste_type.lower())
+            has_heavy = 'heavy' in material_tags
+            has_light_only = not has_heavy and 'light' in material_tags
             
             # Get skip size rules from PDF
-            skip_12_rule = self._extract_pdf_rule('12 yard skips')
             if skip_size == '12yd' and has_heavy:
-                response = skip_12_rule or "For 12 yard skips, we can only take light materials as heavy materials make the skip too heavy to lift. For heavy materials, I'd recommend an 8 yard skip or smaller."
+                response = self._extract_pdf_rule('12 yard skips') or "For 12 yard skips, we can only take light materials as heavy materials make the skip too heavy to lift. For heavy materials, I'd recommend an 8 yard skip or smaller."
                 conversation_state['stage'] = 'A3_SIZE_LOCATION'
             
             # Get Man & Van suggestion from PDF  
-            elif skip_size in ['8yd', '6yd', '4yd'] and has_light_only:
+            elif skip_size in {'8yd', '6yd', '4yd'} and has_light_only:
                 mav_suggestion = self._extract_pdf_rule('MAN & VAN SUGGESTION')
                 response = mav_suggestion or "Since you have light materials, our man & van service might be more cost-effective. Shall I quote both options?"
                 conversation_state['stage'] = 'A2_MAN_VAN_CHOICE'
                 conversation_state['awaiting_mav_choice'] = True
+                self._prefetch_pricing(postcode, 'mav', '6yd')
             else:
                 conversation_state['stage'] = 'A3_SIZE_LOCATION'
-                response = self._continue_to_location_check(conversation_state, extracted)
+                response = self._continue_to_location_check(conversation_state)
         
         # A2: Man & Van choice response
         elif stage == 'A2_MAN_VAN_CHOICE' and conversation_state.get('awaiting_mav_choice'):
-            if 'yes' in message.lower() or 'both' in message.lower():
+            if 'accept_quotes' in routing:
                 # Get both quotes
-                skip_price = self._get_pricing(postcode, 'skip', skip_size)
+                skip_future = _PRICING_POOL.submit(self._get_pricing, postcode, 'skip', skip_size)
                 mav_price = self._get_pricing(postcode, 'mav', '6yd')
+                skip_price = skip_future.result()
                 
                 response = f"💰 PRICE COMPARISON:\n"
                 response += f"Skip Hire ({skip_size}): £{skip_price.get('price', 'N/A')}\n"
@@ -147,21 +240,21 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
                 conversation_state['stage'] = 'A7_QUOTE_RESPONSE'
             else:
                 conversation_state['stage'] = 'A3_SIZE_LOCATION'
-                response = self._continue_to_location_check(conversation_state, extracted)
-        
-        # A3: SKIP SIZE & LOCATION
-        elif stage == 'A3_SIZE_LOCATION':
-            if not extracted.get('location_checked'):
-                response = "Will the skip go on your driveway or on the road?"
-                conversation_state['stage'] = 'A3_LOCATION_RESPONSE'
+                response = self._continue_to_location_check(conversation_state)
+        
+        # A3/A4/A5: question stages - ask unless already answered, then move on
+        elif stage in _GATE_STAGES:
+            checked_flag, answer_stage, next_stage = _GATE_STAGES[stage]
+            if not conversation_state.get(checked_flag):
+                response = _STAGE_PROMPTS[stage]
+                conversation_state['stage'] = answer_stage
             else:
-                conversation_state['stage'] = 'A4_ACCESS'
-                response = self._continue_to_access_check(conversation_state, extracted)
+                conversation_state['stage'] = next_stage
+                response = _STAGE_PROMPTS[next_stage]
         
         # A3: Location response - PERMIT SCRIPT FROM PDF
         elif stage == 'A3_LOCATION_RESPONSE':
-            location = message.lower()
-            if any(word in location for word in ['road', 'street', 'outside', 'front', 'pavement']):
+            if 'road_placement' in routing:
                 # Get permit script from PDF
                 permit_script = self._extract_pdf_rule('PERMIT SCRIPT')
                 response = permit_script or "For any skip placed on the road, a council permit is required. We'll arrange this for you and include the cost in your quote."
@@ -172,7 +265,7 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
             else:
                 conversation_state['needs_permit'] = False
                 conversation_state['stage'] = 'A4_ACCESS'
-                response = self._continue_to_access_check(conversation_state, extracted)
+                response = self._continue_to_access_check(conversation_state)
         
         # A3: Permit questions
         elif stage == 'A3_PERMIT_QUESTIONS':
@@ -185,55 +278,35 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
                 conversation_state['permit_question'] = 3
             else:
                 conversation_state['stage'] = 'A4_ACCESS'
-                response = self._continue_to_access_check(conversation_state, extracted)
-        
-        # A4: ACCESS ASSESSMENT
-        elif stage == 'A4_ACCESS':
-            if not extracted.get('access_checked'):
-                response = "Is there easy access for our lorry to deliver the skip? Any low bridges, narrow roads, or parking restrictions?"
-                conversation_state['stage'] = 'A4_ACCESS_RESPONSE'
-            else:
-                conversation_state['stage'] = 'A5_PROHIBITED'
-                response = self._continue_to_prohibited_check(conversation_state, extracted)
+                response = self._continue_to_access_check(conversation_state)
         
         # A4: Access response
         elif stage == 'A4_ACCESS_RESPONSE':
-            if any(word in message.lower() for word in ['narrow', 'difficult', 'tight', 'complex', 'restricted']):
+            if 'complex_access' in routing:
                 response = "For complex access situations, let me put you through to our team for a site assessment."
                 # Would transfer in office hours, callback out of hours
             else:
-                extracted['access_checked'] = True
+                conversation_state['access_checked'] = True
                 conversation_state['stage'] = 'A5_PROHIBITED'
-                response = self._continue_to_prohibited_check(conversation_state, extracted)
-        
-        # A5: PROHIBITED ITEMS SCREENING
-        elif stage == 'A5_PROHIBITED':
-            if not extracted.get('prohibited_checked'):
-                response = "Do you have any of these items: fridges/freezers, mattresses, or upholstered furniture/sofas?"
-                conversation_state['stage'] = 'A5_PROHIBITED_RESPONSE'
-            else:
-                conversation_state['stage'] = 'A6_TIMING'
-                response = self._continue_to_timing(conversation_state, extracted)
+                response = self._continue_to_prohibited_check(conversation_state)
         
         # A5: Prohibited items response - SURCHARGE CALCULATION FROM PDF
         elif stage == 'A5_PROHIBITED_RESPONSE':
             surcharges = []
             total_surcharge = 0
             
-            message_lower = message.lower()
-            
             # Get surcharge rates from PDF
             fridge_cost = self._extract_pdf_surcharge('Fridges/Freezers', 20)
             mattress_cost = self._extract_pdf_surcharge('Mattresses', 15)  
             furniture_cost = self._extract_pdf_surcharge('Upholstered furniture', 15)
             
-            if any(word in message_lower for word in ['fridge', 'freezer']):
+            if 'fridge_surcharge' in routing:
                 surcharges.append(f"Fridges/Freezers: £{fridge_cost} extra (need degassing)")
                 total_surcharge += fridge_cost
-            if 'mattress' in message_lower:
+            if 'mattress_surcharge' in routing:
                 surcharges.append(f"Mattresses: £{mattress_cost} extra")
                 total_surcharge += mattress_cost
-            if any(word in message_lower for word in ['sofa', 'upholstered', 'furniture']):
+            if 'furniture_surcharge' in routing:
                 surcharges.append(f"Upholstered furniture: £{furniture_cost} extra (due to EA regulations)")
                 total_surcharge += furniture_cost
             
@@ -243,27 +316,27 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
             
             if surcharges:
                 response = f"Noted: {', '.join(surcharges)}\n\n"
-                response += "When do you need this delivered?"
+                response += _STAGE_PROMPTS['A6_TIMING']
             else:
-                response = "When do you need this delivered?"
+                response = _STAGE_PROMPTS['A6_TIMING']
         
         # A6: TIMING & QUOTE GENERATION
         elif stage == 'A6_TIMING':
-            if 'sunday' in message.lower():
+            if 'sunday' in routing:
                 response = "For a collection on a Sunday, it will be a bespoke price. Let me put you through our team."
                 # Would transfer/callback
             else:
                 # Get base pricing and calculate final price
                 conversation_state['stage'] = 'A7_QUOTE_PRESENTATION'
-                response = self._generate_final_quote(conversation_state, extracted, postcode, skip_size)
+                response = self._generate_final_quote(conversation_state, postcode, skip_size)
         
         # A7: QUOTE PRESENTATION & BOOKING
         elif stage == 'A7_QUOTE_PRESENTATION':
-            wants_booking = any(word in message.lower() for word in ['book', 'yes', 'confirm', 'go ahead'])
+            wants_booking = 'booking' in routing
             
             if wants_booking and firstName and phone:
                 # F2: CREATE BOOKING QUOTE with all surcharges
-                booking_ref = str(uuid.uuid4())[:8]
+                booking_ref = f"WK-{secrets.token_hex(_BOOKING_REF_BYTES)}"
                 booking_result = self._create_booking_quote(skip_size, 'skip', postcode, firstName, phone, booking_ref)
                 
                 if booking_result.get('success'):
@@ -293,11 +366,13 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
         
         # F1: PHONE CONFIRMATION
         elif stage == 'F1_PHONE_CONFIRMATION':
-            if not firstName and re.search(r'[A-Z][a-z]+', message):
-                extracted['firstName'] = re.search(r'([A-Z][a-z]+)', message).group(1)
+            name_match = None if firstName else _CAPITALISED_WORD_RE.search(message)
+            phone_match = None if phone else _ELEVEN_DIGITS_RE.search(message)
+            if name_match:
+                conversation_state['firstName'] = name_match.group()
                 response = "What's your phone number?"
-            elif not phone and re.search(r'\d{11}', message):
-                extracted['phone'] = re.search(r'(\d{11})', message).group(1)
+            elif phone_match:
+                conversation_state['phone'] = phone_match.group()
                 conversation_state['stage'] = 'A7_QUOTE_PRESENTATION'
                 response = "Perfect! Ready to book?"
             else:
@@ -309,7 +384,6 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
             conversation_state['stage'] = 'A1_INFO_GATHERING'
         
         # Update state
-        conversation_state['extracted_info'] = extracted
         self._save_conversation_state(conversation_id, conversation_state, message, response, 'orchestrator')
         
         return {
@@ -320,92 +394,81 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
             "timestamp": datetime.now().isoformat()
         }
     
-    def _extract_and_update_state(self, message: str, state: Dict[str, Any], context: Dict = None):
+    def _extract_and_update_state(self, message: str, state: Dict[str, Any], context: Dict = None,
+                                  message_lower: str = None, keyword_hits: List = None):
         """Extract data from message"""
-        extracted = state.get('extracted_info', {})
-        
+        if message_lower is None:
+            message_lower = message.lower()
+        if keyword_hits is None:
+            keyword_hits = _MESSAGE_MATCHER.matches(message_lower)
         if context:
             for key in ['postcode', 'firstName', 'phone', 'size']:
                 if context.get(key):
-                    extracted[key] = context[key]
+                    state[key] = context[key]
+        
+        # Postcode and phone from one scan
+        found = {}
+        for match in _DETAILS_RE.finditer(message):
+            found.setdefault(match.lastgroup, match.group())
         
         # Extract postcode
-        postcode_match = re.search(r'([A-Z]{1,2}[0-9]{1,4}[A-Z]{0,2})', message.upper())
-        if postcode_match:
-            postcode = postcode_match.group(1)
-            extracted['postcode'] = postcode
-            print(f"✅ EXTRACTED POSTCODE: {postcode}")
+        if 'postcode' in found:
+            postcode = found['postcode'].upper()
+            state['postcode'] = postcode
+            if DEBUG:
+                print(f"✅ EXTRACTED POSTCODE: {postcode}")
         
         # Extract name
-        if 'name is' in message.lower():
-            match = re.search(r'name\s+is\s+([A-Z][a-z]+)', message, re.IGNORECASE)
+        keyword_tags = {tag for _, tag in keyword_hits}
+        if 'name_is' in keyword_tags:
+            match = _NAME_IS_RE.search(message)
             if match:
-                extracted['firstName'] = match.group(1)
-                print(f"✅ EXTRACTED NAME: {match.group(1)}")
-        elif 'name' in message.lower():
-            match = re.search(r'name\s+([A-Z][a-z]+)', message, re.IGNORECASE)
+                state['firstName'] = match.group(1)
+                if DEBUG:
+                    print(f"✅ EXTRACTED NAME: {match.group(1)}")
+        elif 'name' in keyword_tags:
+            match = _NAME_RE.search(message)
             if match:
-                extracted['firstName'] = match.group(1)
-                print(f"✅ EXTRACTED NAME: {match.group(1)}")
+                state['firstName'] = match.group(1)
+                if DEBUG:
+                    print(f"✅ EXTRACTED NAME: {match.group(1)}")
         
         # Extract phone
-        phone_match = re.search(r'\b(07\d{9}|\d{11})\b', message)
-        if phone_match:
-            phone = phone_match.group(1)
-            extracted['phone'] = phone
-            print(f"✅ EXTRACTED PHONE: {phone}")
+        if 'phone' in found:
+            phone = found['phone']
+            state['phone'] = phone
+            if DEBUG:
+                print(f"✅ EXTRACTED PHONE: {phone}")
         
         # Extract skip size
-        if re.search(r'8\s*(yard|yd)|eight', message.lower()):
-            extracted['size'] = '8yd'
-        elif re.search(r'12\s*(yard|yd)|twelve', message.lower()):
-            extracted['size'] = '12yd'
-        elif re.search(r'6\s*(yard|yd)|six', message.lower()):
-            extracted['size'] = '6yd'
-        elif re.search(r'4\s*(yard|yd)|four', message.lower()):
-            extracted['size'] = '4yd'
-        else:
-            extracted['size'] = '8yd'  # default
-        
-        # Extract waste type - GET FROM PDF, NO HARDCODING
-        waste_keywords = self._extract_pdf_value('all_waste_types', [
-            'brick', 'bricks', 'rubble', 'concrete', 'soil', 'hardcore', 'stone', 'tiles',
-            'furniture', 'sofa', 'mattress', 'household', 'domestic', 'garden', 'wood', 
-            'construction', 'building', 'demolition', 'mixed', 'general'
-        ])
-        found_waste = []
-        message_lower = message.lower()
-        for keyword in waste_keywords:
-            if keyword in message_lower:
-                found_waste.append(keyword)
-        if found_waste:
-            extracted['waste_type'] = ', '.join(set(found_waste))
-            print(f"✅ EXTRACTED WASTE: {extracted['waste_type']}")
+        found_sizes = {match.lastgroup for match in _SIZE_RE.finditer(message_lower)}
+        size_group = next((group for group in _SIZE_PRIORITY if group in found_sizes), 's8')  # default 8yd
+        state['size'] = _SIZE_BY_GROUP[size_group]
         
-        state['extracted_info'] = extracted
-        
-        # Copy to main state
-        for key in ['postcode', 'firstName', 'phone', 'size', 'waste_type']:
-            if key in extracted:
-                state[key] = extracted[key]
+        # Extract waste type - found in the same keyword pass as routing
+        found_waste = [keyword for keyword, tag in keyword_hits if tag == 'waste']
+        if found_waste:
+            state['waste_type'] = ', '.join(found_waste)
+            if DEBUG:
+                print(f"✅ EXTRACTED WASTE: {state['waste_type']}")
     
-    def _continue_to_location_check(self, state: Dict, extracted: Dict) -> str:
+    def _continue_to_location_check(self, state: Dict) -> str:
         """Continue to location check"""
-        return "Will the skip go on your driveway or on the road?"
+        return _STAGE_PROMPTS['A3_SIZE_LOCATION']
     
-    def _continue_to_access_check(self, state: Dict, extracted: Dict) -> str:  
+    def _continue_to_access_check(self, state: Dict) -> str:  
         """Continue to access check"""
-        return "Is there easy access for our lorry to deliver the skip? Any low bridges, narrow roads, or parking restrictions?"
+        return _STAGE_PROMPTS['A4_ACCESS']
     
-    def _continue_to_prohibited_check(self, state: Dict, extracted: Dict) -> str:
+    def _continue_to_prohibited_check(self, state: Dict) -> str:
         """Continue to prohibited items check"""  
-        return "Do you have any of these items: fridges/freezers, mattresses, or upholstered furniture/sofas?"
+        return _STAGE_PROMPTS['A5_PROHIBITED']
     
-    def _continue_to_timing(self, state: Dict, extracted: Dict) -> str:
+    def _continue_to_timing(self, state: Dict) -> str:
         """Continue to timing"""
-        return "When do you need this delivered?"
+        return _STAGE_PROMPTS['A6_TIMING']
     
-    def _generate_final_quote(self, state: Dict, extracted: Dict, postcode: str, skip_size: str) -> str:
+    def _generate_final_quote(self, state: Dict, postcode: str, skip_size: str) -> str:
         """Generate final quote with PDF extracted values"""
         # Get base price from API (not hardcoded)
         pricing_result = self._get_pricing(postcode, 'skip', skip_size)
@@ -422,22 +485,20 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
         
         final_price = base_price + total_surcharge + permit_cost
         
-        response = f"💰 FINAL QUOTE:\n"
-        response += f"Base price: £{base_price}\n"
+        # Quote lines collected and joined once
+        lines = ["💰 FINAL QUOTE:", f"Base price: £{base_price}"]
         
         if total_surcharge > 0:
-            surcharge_details = state.get('surcharges', [])
-            for detail in surcharge_details:
-                response += f"{detail}\n"
+            lines.extend(state.get('surcharges', []))
         
         if permit_cost > 0:
-            response += f"Council permit: £{permit_cost}\n"
+            lines.append(f"Council permit: £{permit_cost}")
         
-        response += f"TOTAL: £{final_price} including VAT\n\n"
-        response += "Ready to book?"
+        lines.append(f"TOTAL: £{final_price} including VAT\n")
+        lines.append("Ready to book?")
         
         state['final_price'] = final_price
-        return response
+        return "\n".join(lines)
     
     def _add_booking_terms(self) -> str:
         """Add standard booking terms"""
@@ -466,7 +527,12 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
             return default_list
     
     def _extract_pdf_rule(self, rule_name: str) -> str:
-        """Extract exact rule text from PDF"""
+        """Extract exact rule text from PDF (looked up once per rule - pdf_rules is fixed)"""
+        if rule_name not in self._pdf_rules_found:
+            self._pdf_rules_found[rule_name] = self._find_pdf_rule(rule_name)
+        return self._pdf_rules_found[rule_name]
+    
+    def _find_pdf_rule(self, rule_name: str) -> Optional[str]:
         try:
             if rule_name == '12 yard skips':
                 # Look for 12 yard rule in PDF
@@ -491,18 +557,23 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
             return None
     
     def _extract_pdf_surcharge(self, item_name: str, default_cost: int) -> int:
-        """Extract surcharge amounts from PDF"""
+        """Extract surcharge amounts from PDF (looked up once per item - pdf_rules is fixed)"""
+        if item_name not in self._pdf_surcharges:
+            self._pdf_surcharges[item_name] = self._find_pdf_surcharge(item_name)
+        cost = self._pdf_surcharges[item_name]
+        return default_cost if cost is None else cost
+    
+    def _find_pdf_surcharge(self, item_name: str) -> Optional[int]:
         try:
             # Look for surcharge in PDF text
             if f'{item_name}:' in self.pdf_rules:
                 # Extract the cost amount 
-                pattern = f'{item_name}.*?£(\d+)'
-                match = re.search(pattern, self.pdf_rules)
+                match = re.search(rf'{item_name}.*?£(\d+)', self.pdf_rules)
                 if match:
                     return int(match.group(1))
-            return default_cost
+            return None
         except:
-            return default_cost
+            return None
     
     def _send_koyeb_webhook(self, url: str, payload: dict, method: str = "POST") -> dict:
         try:
@@ -519,10 +590,15 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
     
     def _get_pricing(self, postcode: str, service: str, type: str) -> Dict[str, Any]:
         """WORKING: Gets price from API immediately"""
-        url = f"{self.koyeb_url}/api/wasteking-get-price"
-        payload = {"postcode": postcode, "service": service, "type": type}
-        print(f"🔥 PRICING CALL: {payload}")
-        return self._send_koyeb_webhook(url, payload, method="POST")
+        if DEBUG:
+            print(f"🔥 PRICING CALL: {postcode} {service} {type}")
+        # Same cache as the SMP tool, so either side reuses the other's lookups
+        return pricing_cache.get_pricing(self.koyeb_url, postcode, service, type, self._send_koyeb_webhook)
+    
+    def _prefetch_pricing(self, postcode: str, service: str, type: str):
+        """Start a pricing lookup in the background. The later _get_pricing call with the
+        same arguments joins it in flight or reuses its cached result."""
+        _PRICING_POOL.submit(self._get_pricing, postcode, service, type)
     
     def _create_booking_quote(self, type: str, service: str, postcode: str, firstName: str, phone: str, booking_ref: str) -> Dict[str, Any]:
         """WORKING: Creates booking immediately"""
@@ -535,7 +611,8 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
             "firstName": firstName,
             "phone": phone
         }
-        print(f"🔥 BOOKING CALL: {payload}")
+        if DEBUG:
+            print(f"🔥 BOOKING CALL: {payload}")
         return self._send_koyeb_webhook(url, payload, method="POST")
     
     def _send_payment_link(self, phone: str, booking_ref: str, amount: str) -> Dict[str, Any]:
@@ -547,16 +624,18 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
             "amount": amount,
             "call_sid": ""
         }
-        print(f"💳 PAYMENT LINK: {payload}")
+        if DEBUG:
+            print(f"💳 PAYMENT LINK: {payload}")
         result = self._send_koyeb_webhook(url, payload, method="POST")
-        print(f"💳 PAYMENT RESPONSE: {result}")
+        if DEBUG:
+            print(f"💳 PAYMENT RESPONSE: {result}")
         return result
     
     def _load_conversation_state(self, conversation_id: str) -> Dict[str, Any]:
-        global _GLOBAL_CONVERSATION_STATES
-        if conversation_id in _GLOBAL_CONVERSATION_STATES:
-            return _GLOBAL_CONVERSATION_STATES[conversation_id].copy()
-        return {"conversation_id": conversation_id, "messages": [], "extracted_info": {}}
+        state = self.conversation_states.get(conversation_id)
+        if state is not None:
+            return state
+        return {"conversation_id": conversation_id, "messages": []}
     
     def _save_conversation_state(self, conversation_id: str, state: Dict[str, Any], message: str, response: str, agent_used: str):
         if 'messages' not in state:
@@ -571,6 +650,4 @@ Upholstered furniture/sofas - "No, sofa is not allowed in a skip as it's upholst
             state['messages'] = state['messages'][-20:]
         state['last_updated'] = datetime.now().isoformat()
         
-        global _GLOBAL_CONVERSATION_STATES
-        self.conversation_states[conversation_id] = state.copy()
-        _GLOBAL_CONVERSATION_STATES[conversation_id] = state.copy()
+        self.conversation_states.set(conversation_id, state)
@@ -1,15 +1,50 @@
-import json 
 from typing import Dict, Any, List
-from langchain.agents import AgentExecutor, create_openai_functions_agent
+from langchain.agents import AgentExecutor
 from langchain.tools import BaseTool
 from langchain.prompts import ChatPromptTemplate
-from langchain.memory import ConversationBufferWindowMemory
+from memory.summary_buffer_memory import CachedSummaryBufferMemory
+from utils.keyword_matcher import KeywordMatcher
+from utils.serialization import dumps
+from utils.agent_executor import get_agent
+
+# Recent turns stay verbatim up to this many tokens; older ones are folded into a running summary
+_MEMORY_TOKEN_LIMIT = 400
+
+# System prompt and template are static - built once at import and shared by every instance
+_PRICING_SYSTEM = """You are the WasteKing Pricing specialist agent.
+
+PRICING RULES:
+- ALL prices are excluding VAT - always clarify this
+- Present TOTAL price including all surcharges
+- Surcharge rates: Fridge/Freezer £20, Mattress £15, Sofa/Furniture £15
+- VAT must be spelled as "V-A-T" for voice pronunciation
+- Never quote base price only when surcharges apply
+
+EXACT PRICING PRESENTATION:
+"Your [service] is £[base_price], plus £[surcharge_amount] for [items], making your total £[final_price] excluding V-A-T."
+
+Always use SMP API for real pricing when possible, fallback to base rates if API fails.
+"""
+
+_PRICING_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", _PRICING_SYSTEM),
+    ("placeholder", "{chat_history}"),
+    ("human", "{input}"),
+    ("placeholder", "{agent_scratchpad}")
+])
 
 class PricingAgent:
     def __init__(self, llm, tools: List[BaseTool]):
         self.llm = llm
         self.tools = tools
-        self.memory = ConversationBufferWindowMemory(k=10, return_messages=True)
+        self.memory = CachedSummaryBufferMemory(
+            llm=self.llm,
+            max_token_limit=_MEMORY_TOKEN_LIMIT,
+            return_messages=True,
+            memory_key="chat_history",
+            input_key="input",
+            output_key="output"
+        )
         
         self.surcharge_rates = {
             "fridge": 20,
@@ -19,6 +54,8 @@ class PricingAgent:
             "furniture": 15,
             "upholstered": 15
         }
+        # Each item is scanned once for every surcharge keyword; the match tag is the rate
+        self._surcharge_matcher = KeywordMatcher(self.surcharge_rates.items())
         
         self.base_prices = {
             "skip_hire": {"4yd": 180, "6yd": 200, "8yd": 220, "12yd": 280},
@@ -26,30 +63,10 @@ class PricingAgent:
             "grab_hire": {"6_wheeler": 250, "8_wheeler": 300}
         }
         
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are the WasteKing Pricing specialist agent.
-
-PRICING RULES:
-- ALL prices are excluding VAT - always clarify this
-- Present TOTAL price including all surcharges
-- Surcharge rates: Fridge/Freezer £20, Mattress £15, Sofa/Furniture £15
-- VAT must be spelled as "V-A-T" for voice pronunciation
-- Never quote base price only when surcharges apply
-
-EXACT PRICING PRESENTATION:
-"Your [service] is £[base_price], plus £[surcharge_amount] for [items], making your total £[final_price] excluding V-A-T."
-
-Always use SMP API for real pricing when possible, fallback to base rates if API fails.
-"""),
-            ("human", "{input}"),
-            ("placeholder", "{agent_scratchpad}")
-        ])
+        self.prompt = _PRICING_PROMPT
         
-        self.agent = create_openai_functions_agent(
-            llm=self.llm,
-            tools=self.tools,
-            prompt=self.prompt
-        )
+        # Agent shared across instances; the executor is per instance as it carries this agent's memory
+        self.agent = get_agent(self.llm, self.tools, self.prompt)
         
         self.executor = AgentExecutor(
             agent=self.agent,
@@ -63,7 +80,7 @@ Always use SMP API for real pricing when possible, fallback to base rates if API
         try:
             response = self.executor.invoke({
                 "input": message,
-                "context": json.dumps(context) if context else "{}"
+                "context": dumps(context) if context else "{}"
             })
             return response["output"]
         except Exception as e:
@@ -74,11 +91,9 @@ Always use SMP API for real pricing when possible, fallback to base rates if API
         surcharge_breakdown = []
         
         for item in items:
-            item_lower = item.lower()
-            for surcharge_item, rate in self.surcharge_rates.items():
-                if surcharge_item in item_lower:
-                    total_surcharge += rate
-                    surcharge_breakdown.append({"item": item, "rate": rate})
+            for _, rate in self._surcharge_matcher.matches(item.lower()):
+                total_surcharge += rate
+                surcharge_breakdown.append({"item": item, "rate": rate})
         
         return {
             "total_surcharge": total_surcharge,
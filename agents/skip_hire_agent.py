@@ -1,25 +1,82 @@
+import asyncio
 import json 
 import re
-import os
-from typing import Dict, Any, List
-from langchain.agents import AgentExecutor, create_openai_functions_agent
+import secrets
+from typing import Dict, Any, List, Tuple
+from langchain.agents import AgentExecutor
 from langchain.tools import BaseTool
-from langchain.prompts import ChatPromptTemplate
-import PyPDF2
+from utils.pdf_rules import load_agent_rules
+from utils.rules_prompt import build_rules_prompt
+from utils.agent_executor import get_agent_executor
+from utils.serialization import dumps
+from utils.keyword_matcher import KeywordMatcher
+from utils.batching import map_batch, amap_batch
+from utils.customer_details import extract_customer_details
+from utils.conversation_store import ConversationStore
+from config.settings import settings
 
-class SkipHireAgent:
-    def __init__(self, llm, tools: List[BaseTool]):
-        self.llm = llm
-        self.tools = tools
-        
-        # Direct PDF import from data/rules/all_rules.pdf
-        pdf_rules = self._load_pdf_rules()
-        
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", f"""You are a Skip Hire agent. Be FAST and DIRECT.
+# Per-call trace output and agent verbosity - only when LOG_LEVEL=DEBUG
+DEBUG = settings.DEBUG
+
+# Context slots carried into extraction - also the memo key for repeat calls
+_CONTEXT_KEYS = ('postcode', 'firstName', 'phone', 'emailAddress', 'waste_type')
+# Per-session working memory - filled slots are never re-asked; a new value in a later turn replaces the old one
+_SLOT_KEYS = ('postcode', 'waste_type', 'size', 'firstName', 'phone')
+# Filled slots by session - bounded and expired like conversation state, shared across workers with Redis
+_SESSION_SLOTS = ConversationStore(
+    settings.REDIS_URL, ttl=settings.CONVERSATION_STATE_TTL, prefix='skip_slots:',
+    maxsize=settings.CONVERSATION_STATE_MAXSIZE
+)
+# Skip sizes as typed ("12 yard", "8yd", "six yard") - normalised to the API's "<n>yd"
+_SIZE_RE = re.compile(
+    r'\b(2|4|6|8|10|12|14|16)\s*-?\s*(?:yards?|yds?)\b'
+    r'|\b(two|four|six|eight|ten|twelve|fourteen|sixteen)[\s-]*(?:yards?|yds?)\b',
+    re.IGNORECASE
+)
+_SIZE_WORDS = {'two': '2', 'four': '4', 'six': '6', 'eight': '8', 'ten': '10', 'twelve': '12', 'fourteen': '14', 'sixteen': '16'}
+# Keyword table scanned once per message - waste types in reporting order, plus booking intent
+# and the triggers for the rules document's exact scripts
+_HEAVY_WASTE = ('bricks', 'concrete', 'soil', 'rubble')
+_KEYWORD_MATCHER = KeywordMatcher(
+    [(waste, 'waste') for waste in ('household', 'construction', 'garden', 'mixed', 'bricks', 'concrete', 'soil', 'rubble')]
+    + [(waste, 'heavy') for waste in _HEAVY_WASTE]
+    + [('book', 'booking')]
+    + [(item, 'sofa') for item in ('sofa', 'settee', 'upholstered')],
+    cache_size=4096
+)
+
+# Exact scripts (LOCK 5) - single-reply answers returned without an LLM round-trip, checked in this order.
+# Never used on a booking turn. Road placement stays with the agent: the permit script is followed by
+# the permit questions, one per turn, which a canned reply cannot carry on.
+_LARGEST_HEAVY_SKIP = 8
+_EXACT_SCRIPTS = {
+    'sofa': "No, sofa is not allowed in a skip as it's upholstered furniture. We can help with Man & Van service. We charge extra due to EA regulations.",
+    'heavy_large': "For heavy materials such as soil & rubble, the largest skip you can have is 8-yard. Shall I get you the cost of an 8-yard skip?",
+}
 
-RULES FROM PDF KNOWLEDGE BASE:
-{pdf_rules}
+# Turn decision as a lookup: each filled slot (and booking intent) sets one bit of the mask,
+# _TURN_TABLE[mask] is the (reply, action) pair - reply when something is missing, else the agent action
+_FIELD_BITS = (('postcode', 1), ('waste_type', 2), ('firstName', 4), ('phone', 8))
+_BOOKING_BIT = 16
+_ALL_INFO_BITS = 1 | 2 | 4 | 8
+
+def _decide_turn(mask: int) -> Tuple[str, str]:
+    if mask & _BOOKING_BIT and mask & _ALL_INFO_BITS == _ALL_INFO_BITS:
+        return None, "create_booking_quote"
+    if not mask & 1:
+        return "What's your postcode?", None
+    if not mask & 2:
+        return "What type of waste?", None
+    return None, "get_pricing"
+
+_TURN_TABLE = tuple(_decide_turn(mask) for mask in range(_BOOKING_BIT << 1))
+_ACTION_TRACE = {
+    "create_booking_quote": "🔧 CREATING BOOKING IMMEDIATELY",
+    "get_pricing": "🔧 GETTING PRICING FIRST",
+}
+
+# Agent instructions - follow the shared rules block at the start of the system prompt
+_SKIP_SYSTEM_PROMPT = """You are a Skip Hire agent. Be FAST and DIRECT.
 
 CRITICAL WORKFLOW:
 1. If customer provides ALL info (postcode + waste + name + phone): IMMEDIATELY call create_booking_quote
@@ -29,84 +86,183 @@ CRITICAL WORKFLOW:
 API CALLS:
 - BOOKING: smp_api(action="create_booking_quote", postcode=X, service="skip", firstName=X, phone=X, booking_ref=X)
 - PRICING: smp_api(action="get_pricing", postcode=X, service="skip")
+- If Data has a "price", it is the current API price for that postcode and size - present it
+  following the PDF rules (surcharges, permit, V-A-T) without calling get_pricing again
 
 IMPORTANT: Customer says "Book" + provides name/phone = CREATE BOOKING IMMEDIATELY
 
-Follow PDF rules above. Be direct."""),
-            ("human", "Customer: {input}\n\nData: {extracted_info}"),
-            ("placeholder", "{agent_scratchpad}")
-        ])
-        
-        self.agent = create_openai_functions_agent(llm=self.llm, tools=self.tools, prompt=self.prompt)
-        self.executor = AgentExecutor(agent=self.agent, tools=self.tools, verbose=True, max_iterations=10)
-    
-    def _load_pdf_rules(self) -> str:
-        """Load rules directly from data/rules/all rules.pdf"""
-        try:
-            pdf_path = "data/rules/all rules.pdf"
-            print(f"🔧 SKIP AGENT: Loading PDF rules from: {pdf_path}")
-            if os.path.exists(pdf_path):
-                with open(pdf_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    for page in pdf_reader.pages:
-                        text += page.extract_text()
-                print(f"🔧 SKIP AGENT: PDF rules loaded successfully ({len(text)} characters)")
-                return text
-            else:
-                print(f"❌ SKIP AGENT: PDF rules not found at {pdf_path}")
-                return "PDF rules not found - using basic skip hire rules"
-        except Exception as e:
-            print(f"❌ SKIP AGENT: Error loading PDF rules: {e}")
-            return "PDF rules not available - using basic skip hire rules"
-    
-    def process_message(self, message: str, context: Dict = None) -> str:
+Follow PDF rules above. Be direct."""
+
+_SKIP_HUMAN_TEMPLATE = "Customer: {input}\n\nData (JSON): {extracted_info}"
+
+# Booking with every slot filled is deterministic - call the API tool directly instead of the agent loop.
+# SMPAPITool's name - the direct booking path books through that tool.
+_SMP_TOOL_NAME = "smp_api"
+# Names the direct path will book under - letters only, so "John 07123456789" goes to the agent instead
+_BOOKABLE_NAME_RE = re.compile(r"[A-Za-z][A-Za-z' -]{0,39}")
+_BOOKING_CONFIRMATION = "Booking confirmed, {name}! Your reference is {booking_ref}{price}. {payment}"
+
+class SkipHireAgent:
+    # Fixed attribute set - no per-instance __dict__
+    __slots__ = ('llm', 'tools', '_tools_by_name', '_last_extraction', 'slots', '_prompt', '_agent', '_executor', 'smp_tool')
+    
+    def __init__(self, llm, tools: List[BaseTool]):
+        self.llm = llm
+        self.tools = tools
+        self._tools_by_name = {tool.name: tool for tool in tools}
+        self._last_extraction = None  # (message, context slots) -> extracted data
+        self.slots = _SESSION_SLOTS  # session_id -> filled slots
+        
+        # Rules, prompt, agent and executor are built on first LLM dispatch - slot-collection replies never need them
+        self._prompt = None
+        self._agent = None
+        self._executor = None
+        self.smp_tool = self._tools_by_name.get(_SMP_TOOL_NAME)
+    
+    @property
+    def prompt(self):
+        if self._prompt is None:
+            # Direct PDF import from data/rules/all_rules.pdf
+            pdf_rules = load_agent_rules("SKIP AGENT", "skip hire")
+            self._prompt = build_rules_prompt(pdf_rules, _SKIP_SYSTEM_PROMPT, _SKIP_HUMAN_TEMPLATE)
+        return self._prompt
+    
+    @property
+    def agent(self):
+        if self._agent is None:
+            self._agent, self._executor = get_agent_executor(self.llm, self.tools, self.prompt, max_iterations=10, verbose=DEBUG)
+        return self._agent
+    
+    @property
+    def executor(self) -> AgentExecutor:
+        if self._executor is None:
+            self._agent, self._executor = get_agent_executor(self.llm, self.tools, self.prompt, max_iterations=10, verbose=DEBUG)
+        return self._executor
+    
+    def process_message(self, message: str, context: Dict = None, session_id: str = None) -> str:
         """Process with proper data extraction"""
+        reply, action, extracted_data, agent_input = self._plan_turn(message, context, session_id)
+        if reply is not None:
+            return reply
+        return self._dispatch(action, extracted_data, agent_input)
+    
+    def process_batch(self, items: List[Tuple[str, Dict, str]]) -> List[str]:
+        """Process many (message, context, session_id) turns, e.g. a log replay.
+        Extraction and action choice run in order (slots build up turn by turn); the
+        turns that need the API or the LLM then run concurrently. Replies keep input order."""
+        replies, pending, turns = self._plan_batch(items)
+        for index, reply in zip(pending, map_batch(self._dispatch, turns, settings.AGENT_CONCURRENCY_LIMIT)):
+            replies[index] = reply
+        return replies
+    
+    def _plan_batch(self, items: List[Tuple[str, Dict, str]]) -> Tuple[List[str], List[int], List[Tuple]]:
+        """Plan every turn in order - (replies so far, indices still to dispatch, their dispatch args)"""
+        plans = [self._plan_turn(message, context, session_id) for message, context, session_id in items]
+        replies = [reply for reply, _, _, _ in plans]
+        pending = [index for index, reply in enumerate(replies) if reply is None]
+        return replies, pending, [plans[index][1:] for index in pending]
+    
+    def _dispatch(self, action: str, extracted_data: Dict[str, Any], agent_input: Dict[str, Any]) -> str:
+        """Run a planned turn - direct booking, else the agent executor"""
+        if action == "create_booking_quote":
+            confirmation = self._book_directly(extracted_data)
+            if confirmation:
+                return confirmation
+        
+        self._trace_execution(action)
+        response = self.executor.invoke(agent_input)
+        if DEBUG:
+            print(f"🔧 SKIP AGENT: Agent execution completed successfully")
+        return response["output"]
+    
+    async def aprocess_message(self, message: str, context: Dict = None, session_id: str = None) -> str:
+        """Async process_message - the agent runs via ainvoke and blocking tool HTTP in a worker
+        thread, so concurrent conversations can share one event loop"""
+        reply, action, extracted_data, agent_input = self._plan_turn(message, context, session_id)
+        if reply is not None:
+            return reply
+        return await self._adispatch(action, extracted_data, agent_input)
+    
+    async def run_batch_async(self, items: List[Tuple[str, Dict, str]]) -> List[str]:
+        """process_batch on the event loop - turns are planned in order, then at most
+        AGENT_CONCURRENCY_LIMIT of the API / LLM turns run at once. Replies keep input order."""
+        replies, pending, turns = self._plan_batch(items)
+        for index, reply in zip(pending, await amap_batch(self._adispatch, turns, settings.AGENT_CONCURRENCY_LIMIT)):
+            replies[index] = reply
+        return replies
+    
+    async def _adispatch(self, action: str, extracted_data: Dict[str, Any], agent_input: Dict[str, Any]) -> str:
+        """Async _dispatch"""
+        if action == "create_booking_quote":
+            confirmation = await asyncio.to_thread(self._book_directly, extracted_data)
+            if confirmation:
+                return confirmation
         
-        extracted_data = self._extract_data_properly(message, context)
+        self._trace_execution(action)
+        response = await self.executor.ainvoke(agent_input)
+        if DEBUG:
+            print(f"🔧 SKIP AGENT: Agent execution completed successfully")
+        return response["output"]
+    
+    def _plan_turn(self, message: str, context: Dict = None, session_id: str = None) -> Tuple[str, str, Dict[str, Any], Dict[str, Any]]:
+        """Extract this turn's data and pick the action.
+        Returns (reply, None, None, None) when no agent call is needed, else (None, action, extracted_data, agent_input)."""
+        message_lower = message.lower()
+        keyword_hits = _KEYWORD_MATCHER.matches(message_lower)
+        extracted_data = self._extract_data_properly(message, context, keyword_hits)
+        turn_size = extracted_data.get('size')  # before slots - a size from an earlier turn was already answered
+        if session_id:
+            extracted_data = self._fill_slots(session_id, extracted_data)
         
-        print(f"🔧 SKIP DATA: {json.dumps(extracted_data, indent=2)}")
+        if DEBUG:
+            print(f"🔧 SKIP DATA: {json.dumps(extracted_data, indent=2)}")
         
         postcode = extracted_data.get('postcode')
         waste_type = extracted_data.get('waste_type')
-        has_name = bool(extracted_data.get('firstName'))
-        has_phone = bool(extracted_data.get('phone'))
-        
-        wants_booking = 'book' in message.lower()
-        has_all_info = postcode and waste_type and has_name and has_phone
-        
-        print(f"🎯 DECISION:")
-        print(f"   - Wants booking: {wants_booking}")
-        print(f"   - Has all info: {has_all_info}")
-        print(f"   - Name: {extracted_data.get('firstName')}")
-        print(f"   - Phone: {extracted_data.get('phone')}")
-        
-        if wants_booking and has_all_info:
-            action = "create_booking_quote"
-            print(f"🔧 CREATING BOOKING IMMEDIATELY")
-        elif postcode and waste_type:
-            action = "get_pricing"
-            print(f"🔧 GETTING PRICING FIRST")
-        else:
-            if not postcode:
-                return "What's your postcode?"
-            if not waste_type:
-                return "What type of waste?"
-            return "Let me get you a quote."
-        
-        extracted_info = f"""
-Postcode: {postcode}
-Waste Type: {waste_type}
-Service: skip
-Customer Name: {extracted_data.get('firstName', 'NOT PROVIDED')}
-Customer Phone: {extracted_data.get('phone', 'NOT PROVIDED')}
-Action: {action}
-Ready for API: True
-"""
+        wants_booking = any(tag == 'booking' for _, tag in keyword_hits)
+        
+        script = None if wants_booking else self._exact_script(keyword_hits, turn_size, waste_type)
+        if script is not None:
+            if DEBUG:
+                print(f"📜 SKIP AGENT: Exact script '{script}', no agent call")
+            if script == 'heavy_large' and session_id:
+                self._forget_slot(session_id, 'size')  # refused - the customer still has to pick a size
+            return _EXACT_SCRIPTS[script], None, None, None
+        
+        mask = _BOOKING_BIT if wants_booking else 0
+        for key, bit in _FIELD_BITS:
+            if extracted_data.get(key):
+                mask |= bit
+        reply, action = _TURN_TABLE[mask]
+        
+        if DEBUG:
+            print(f"🎯 DECISION:")
+            print(f"   - Wants booking: {wants_booking}")
+            print(f"   - Has all info: {mask & _ALL_INFO_BITS == _ALL_INFO_BITS}")
+            print(f"   - Name: {extracted_data.get('firstName')}")
+            print(f"   - Phone: {extracted_data.get('phone')}")
+        
+        if reply is not None:
+            return reply, None, None, None
+        if DEBUG:
+            print(_ACTION_TRACE[action])
+        
+        info = {
+            "postcode": postcode,
+            "waste_type": waste_type,
+            "service": "skip",
+            "firstName": extracted_data.get('firstName'),
+            "phone": extracted_data.get('phone'),
+            "action": action
+        }
+        if action == "get_pricing":
+            price = self._cached_price(extracted_data)
+            if price is not None:
+                info.update(size=extracted_data['size'], price=price)  # the agent words the quote, no tool call
+        extracted_info = dumps(info)
         
         if action == "create_booking_quote":
-            import uuid
-            extracted_data['booking_ref'] = str(uuid.uuid4())
+            extracted_data['booking_ref'] = secrets.token_hex(16)
         
         agent_input = {
             "input": message,
@@ -114,75 +270,122 @@ Ready for API: True
             "action": action,
             **extracted_data
         }
+        return None, action, extracted_data, agent_input
+    
+    def _exact_script(self, keyword_hits: List, size: str = None, waste_type: str = None) -> str:
+        """The _EXACT_SCRIPTS entry this turn hits, else None.
+        Heavy waste may come from an earlier turn's slot, the size and the rest from this message.
+        A sofa mentioned alongside other waste ("no sofa, just garden waste") is left to the agent."""
+        tags = {tag for _, tag in keyword_hits}
+        if 'waste' in tags:
+            tags.discard('sofa')
+        heavy = 'heavy' in tags or any(waste in (waste_type or '') for waste in _HEAVY_WASTE)
+        if heavy and size and int(size[:-2]) > _LARGEST_HEAVY_SKIP:
+            tags.add('heavy_large')
+        for trigger in _EXACT_SCRIPTS:
+            if trigger in tags:
+                return trigger
+        return None
+    
+    def _cached_price(self, extracted_data: Dict[str, Any]) -> Any:
+        """Price the SMP tool already holds for this postcode and extracted size, else None"""
+        size = extracted_data.get('size')
+        if self.smp_tool is None or not size:
+            return None
         
-        print(f"🔧 SKIP AGENT: Executing agent with action: {action}")
-        print(f"🔧 SKIP AGENT: Tools available: {[tool.name for tool in self.tools]}")
-        response = self.executor.invoke(agent_input)
-        print(f"🔧 SKIP AGENT: Agent execution completed successfully")
-        return response["output"]
+        pricing = self.smp_tool.cached_pricing(extracted_data['postcode'], "skip", size)
+        if not pricing or not pricing.get('price'):
+            return None
+        if DEBUG:
+            print(f"🔧 SKIP AGENT: Cached price for {extracted_data['postcode']} {size} passed to the agent")
+        return pricing['price']
+    
+    def _trace_execution(self, action: str):
+        if DEBUG:
+            print(f"🔧 SKIP AGENT: Executing agent with action: {action}")
+            print(f"🔧 SKIP AGENT: Tools available: {list(self._tools_by_name)}")
+    
+    def _book_directly(self, extracted_data: Dict[str, Any]) -> str:
+        """Create the booking with one smp_api call - None if the tool is missing, the size or name
+        was not cleanly parsed (the agent reads those from the message) or the booking failed"""
+        if self.smp_tool is None:
+            return None
+        if not extracted_data.get('size') or not _BOOKABLE_NAME_RE.fullmatch(extracted_data['firstName']):
+            if DEBUG:
+                print(f"🔧 SKIP AGENT: Size or name not parsed cleanly, booking via agent")
+            return None
+        
+        if DEBUG:
+            print(f"🔧 SKIP AGENT: Booking directly via {_SMP_TOOL_NAME}")
+        result = self.smp_tool.create_booking(
+            postcode=extracted_data['postcode'],
+            service="skip",
+            type=extracted_data['size'],
+            firstName=extracted_data['firstName'],
+            phone=extracted_data['phone'],
+            booking_ref=extracted_data['booking_ref']
+        )
+        if not result.get('success'):
+            if DEBUG:
+                print(f"❌ SKIP AGENT: Direct booking failed, falling back to agent: {result}")
+            return None
+        
+        price = result.get('final_price')
+        payment_link = result.get('payment_link')
+        return _BOOKING_CONFIRMATION.format(
+            name=extracted_data['firstName'],
+            booking_ref=result.get('booking_ref') or extracted_data['booking_ref'],
+            price=f" and the total is £{price}" if price else "",
+            payment=f"Pay securely here: {payment_link}" if payment_link else f"We'll text the payment link to {extracted_data['phone']}."
+        )
+    
+    def _fill_slots(self, session_id: str, extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge this turn's extraction into the session's slots - this turn's values win,
+        so a customer can correct a postcode or size; slots fill in what this turn lacks"""
+        stored = self.slots.get(session_id) or {}
+        slots = {key: stored[key] for key in _SLOT_KEYS if stored.get(key)}
+        slots.update({key: extracted_data[key] for key in _SLOT_KEYS if extracted_data.get(key)})
+        self.slots.set(session_id, slots)  # also restarts the session's idle TTL
+        return {**slots, **extracted_data}
     
-    def _extract_data_properly(self, message: str, context: Dict = None) -> Dict[str, Any]:
+    def _forget_slot(self, session_id: str, key: str):
+        slots = self.slots.get(session_id)
+        if slots and slots.pop(key, None):
+            self.slots.set(session_id, slots)
+    
+    def _extract_data_properly(self, message: str, context: Dict = None, keyword_hits: List = None) -> Dict[str, Any]:
         """Proper data extraction that actually works"""
+        # Same message and context as last time (agent retry / repeated turn) - reuse the result
+        cache_key = (message, tuple(context.get(key) for key in _CONTEXT_KEYS) if context else None)
+        memo = self._last_extraction
+        if memo is not None and memo[0] == cache_key:
+            return dict(memo[1])
+        
+        if keyword_hits is None:
+            keyword_hits = _KEYWORD_MATCHER.matches(message.lower())
         data = {}
         
         if context:
-            for key in ['postcode', 'firstName', 'phone', 'emailAddress', 'waste_type']:
+            for key in _CONTEXT_KEYS:
                 if context.get(key):
                     data[key] = context[key]
         
-        postcode_patterns = [
-            r'\b([A-Z]{1,2}\d{1,2}[A-Z]?\d[A-Z]{2})\b',
-            r'M1\s*1AB|M11AB',
-        ]
-        for pattern in postcode_patterns:
-            matches = re.findall(pattern, message.upper())
-            for match in matches:
-                clean = match.strip().replace(' ', '')
-                if len(clean) >= 5:
-                    data['postcode'] = clean
-                    print(f"✅ FOUND POSTCODE: {clean}")
-                    break
-        
-        name_patterns = [
-            r'[Nn]ame\s+(\w+\s+\w+)',
-            r'[Nn]ame\s+(\w+)',
-            r'my name is (\w+)',
-            r'i\'m (\w+)',
-            r'call me (\w+)'
-        ]
-        for pattern in name_patterns:
-            match = re.search(pattern, message, re.IGNORECASE)
-            if match:
-                name = match.group(1).strip().title()
-                data['firstName'] = name
-                print(f"✅ FOUND NAME: {name}")
-                break
-        
-        phone_patterns = [
-            r'payment link to (\d{11})',
-            r'link to (\d{11})',
-            r'to (\d{11})',
-            r'\b(07\d{9})\b',
-            r'\b(\d{11})\b'
-        ]
-        for pattern in phone_patterns:
-            match = re.search(pattern, message)
-            if match:
-                phone = match.group(1)
-                data['phone'] = phone
-                print(f"✅ FOUND PHONE: {phone}")
-                break
-        
-        waste_types = ['household', 'construction', 'garden', 'mixed', 'bricks', 'concrete', 'soil', 'rubble']
-        found = []
-        message_lower = message.lower()
-        for waste in waste_types:
-            if waste in message_lower:
-                found.append(waste)
-        if found:
-            data['waste_type'] = ', '.join(found)
-            print(f"✅ FOUND WASTE: {data['waste_type']}")
+        extract_customer_details(message, data)
+        
+        size = _SIZE_RE.search(message)
+        if size:
+            data['size'] = f"{size.group(1) or _SIZE_WORDS[size.group(2).lower()]}yd"
+            if DEBUG:
+                print(f"✅ FOUND SIZE: {data['size']}")
+        
+        if not data.get('waste_type'):
+            found = [keyword for keyword, tag in keyword_hits if tag == 'waste']
+            if found:
+                data['waste_type'] = ', '.join(found)
+                if DEBUG:
+                    print(f"✅ FOUND WASTE: {data['waste_type']}")
         
         data['service'] = 'skip'
         
+        self._last_extraction = (cache_key, dict(data))
         return data
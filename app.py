@@ -1,5 +1,4 @@
 import os
-import json
 from datetime import datetime
 from flask import Flask, request, jsonify
 from langchain_openai import ChatOpenAI
@@ -71,7 +70,12 @@ def initialize_system():
     orchestrator = AgentOrchestrator(llm, agents)
     
     # Initialize supporting components
-    state_manager = StateManager(settings.DATABASE_PATH)
+    db_config = settings.get_database_config()
+    state_manager = StateManager(
+        db_config['path'],
+        flush_interval=db_config['flush_interval'],
+        flush_batch_size=db_config['flush_batch_size']
+    )
     rules_processor = RulesProcessor()
     
     print("System initialization complete")
@@ -1,17 +1,15 @@
-import json
 from typing import Dict, Any, List
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from langchain.memory import ConversationBufferWindowMemory
-from langchain.schema import BaseMessage
+from memory.slot_memory import SlotMemory
 
 class ConversationChain:
     def __init__(self, llm):
         self.llm = llm
-        self.memory = ConversationBufferWindowMemory(k=10, return_messages=True)
+        self.memory = SlotMemory(window=2)
         
         self.prompt = PromptTemplate(
-            input_variables=["conversation_history", "current_message", "business_rules", "customer_data"],
+            input_variables=["conversation_history", "current_message", "business_rules", "slots"],
             template='''You are the WasteKing AI assistant managing a customer conversation.
 
 BUSINESS RULES TO FOLLOW:
@@ -20,8 +18,8 @@ BUSINESS RULES TO FOLLOW:
 CONVERSATION HISTORY:
 {conversation_history}
 
-CUSTOMER DATA COLLECTED:
-{customer_data}
+CUSTOMER DATA COLLECTED (JSON):
+{slots}
 
 CURRENT MESSAGE: {current_message}
 
@@ -44,35 +42,29 @@ Response:'''
     
     def process_conversation(self, message: str, customer_data: Dict = None, business_rules: str = "") -> str:
         try:
+            # Slots and recent turns come from memory; only the new values are merged in
+            self.memory.update_slots(customer_data)
             response = self.chain.run(
                 current_message=message,
-                customer_data=json.dumps(customer_data or {}),
-                business_rules=business_rules,
-                conversation_history=self._format_history()
+                business_rules=business_rules
             )
             return response.strip()
         except Exception as e:
             return "I understand. How can I help you today?"
     
     def _format_history(self) -> str:
-        messages = self.memory.chat_memory.messages[-6:]
-        formatted = []
-        for msg in messages:
-            if hasattr(msg, 'content'):
-                formatted.append(f"{msg.__class__.__name__}: {msg.content}")
-        return "\n".join(formatted)
+        return self.memory.load_memory_variables({})["conversation_history"]
     
     def clear_memory(self):
         self.memory.clear()
     
     def get_conversation_summary(self) -> str:
-        messages = self.memory.chat_memory.messages
-        if not messages:
+        if not self.memory.recent and not self.memory.slots:
             return "No conversation yet"
         
-        summary_parts = []
-        for msg in messages[-10:]:
-            if hasattr(msg, 'content'):
-                summary_parts.append(msg.content[:100])
+        summary_parts = [f"{key}: {value}" for key, value in self.memory.slots.items()]
+        for human, ai in self.memory.recent:
+            summary_parts.append(human[:100])
+            summary_parts.append(ai[:100])
         
         return " | ".join(summary_parts)
@@ -20,6 +20,9 @@ class Settings:
         
         # Database Configuration
         self.DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/conversations.db')
+        self.REDIS_URL = os.getenv('REDIS_URL', '')
+        self.CONVERSATION_STATE_TTL = int(os.getenv('CONVERSATION_STATE_TTL', '3600'))
+        self.CONVERSATION_STATE_MAXSIZE = int(os.getenv('CONVERSATION_STATE_MAXSIZE', '10000'))
         
         # Agent Configuration
         self.MAX_CONVERSATION_MEMORY = int(os.getenv('MAX_CONVERSATION_MEMORY', '50'))
@@ -33,6 +36,7 @@ class Settings:
         
         # Logging Configuration
         self.LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+        self.DEBUG = self.LOG_LEVEL.upper() == 'DEBUG'
         self.LOG_FILE = os.getenv('LOG_FILE', 'data/logs/wasteking_ai.log')
         self.ENABLE_STRUCTURED_LOGGING = os.getenv('ENABLE_STRUCTURED_LOGGING', 'true').lower() == 'true'
         
@@ -40,6 +44,9 @@ class Settings:
         self.VECTOR_STORE_CACHE_SIZE = int(os.getenv('VECTOR_STORE_CACHE_SIZE', '1000'))
         self.EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
         self.AGENT_CONCURRENCY_LIMIT = int(os.getenv('AGENT_CONCURRENCY_LIMIT', '10'))
+        self.STATE_FLUSH_INTERVAL_MS = int(os.getenv('STATE_FLUSH_INTERVAL_MS', '250'))
+        self.STATE_FLUSH_BATCH_SIZE = int(os.getenv('STATE_FLUSH_BATCH_SIZE', '50'))
+        self.PRICING_CACHE_TTL = float(os.getenv('PRICING_CACHE_TTL', '300'))
     
     def get_agent_config(self) -> Dict[str, Any]:
         '''Get agent configuration'''
@@ -66,7 +73,9 @@ class Settings:
     def get_database_config(self) -> Dict[str, Any]:
         '''Get database configuration'''
         return {
-            'path': self.DATABASE_PATH
+            'path': self.DATABASE_PATH,
+            'flush_interval': self.STATE_FLUSH_INTERVAL_MS / 1000,
+            'flush_batch_size': self.STATE_FLUSH_BATCH_SIZE
         }
     
     def validate_configuration(self) -> Dict[str, Any]:
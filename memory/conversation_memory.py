@@ -1,9 +1,9 @@
-import json
 import sqlite3
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.schema import BaseMessage, HumanMessage, AIMessage
+from utils.serialization import dumps, loads
 
 class ConversationMemory:
     def __init__(self, db_path: str = "data/conversations.db", window_size: int = 10):
@@ -72,7 +72,7 @@ class ConversationMemory:
             message_type,
             content,
             datetime.now().isoformat(),
-            json.dumps(metadata or {})
+            dumps(metadata or {})
         ))
         
         conn.commit()
@@ -102,7 +102,7 @@ class ConversationMemory:
                 "type": row[0],
                 "content": row[1], 
                 "timestamp": row[2],
-                "metadata": json.loads(row[3]) if row[3] else {}
+                "metadata": loads(row[3]) if row[3] else {}
             }
             for row in rows
         ]
@@ -0,0 +1,40 @@
+from typing import Any, Dict, List, Tuple
+from langchain.schema import BaseMemory
+from utils.serialization import dumps
+
+class SlotMemory(BaseMemory):
+    '''Conversation memory that keeps parsed customer slots (postcode, name, phone,
+    waste...) as one compact JSON blob plus the last few turns verbatim, instead
+    of replaying a full message window on every call.'''
+    
+    slots: Dict[str, Any] = {}
+    recent: List[Tuple[str, str]] = []
+    window: int = 2
+    input_key: str = "current_message"
+    output_key: str = "text"
+    
+    @property
+    def memory_variables(self) -> List[str]:
+        return ["slots", "conversation_history"]
+    
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            "slots": dumps(self.slots),
+            "conversation_history": "\n".join(
+                f"Customer: {human}\nAssistant: {ai}" for human, ai in self.recent
+            )
+        }
+    
+    def update_slots(self, data: Dict[str, Any]):
+        '''Merge newly extracted values - empty values never overwrite known ones'''
+        if data:
+            self.slots.update({key: value for key, value in data.items() if value})
+    
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        self.recent.append((inputs.get(self.input_key, ""), outputs.get(self.output_key, "")))
+        if len(self.recent) > self.window:
+            del self.recent[:-self.window]
+    
+    def clear(self) -> None:
+        self.slots = {}
+        self.recent = []
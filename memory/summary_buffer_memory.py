@@ -0,0 +1,44 @@
+from typing import Any, Dict, List, Tuple
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain.schema import BaseMessage
+
+class TokenCountCache:
+    '''Per-message token counts - each message is encoded once, not on every prune pass'''
+    
+    def __init__(self, llm):
+        self.llm = llm
+        # id(message) -> (message, tokens); holding the message keeps its id from being reused
+        self._counts: Dict[int, Tuple[BaseMessage, int]] = {}
+    
+    def count(self, messages: List[BaseMessage]) -> int:
+        '''Token count of messages, encoding only the ones not seen before'''
+        counts = {}
+        total = 0
+        for message in messages:
+            entry = self._counts.get(id(message))
+            if entry is None or entry[0] is not message:
+                entry = (message, self.llm.get_num_tokens_from_messages([message]))
+            counts[id(message)] = entry
+            total += entry[1]
+        # Only messages still in the buffer are kept
+        self._counts = counts
+        return total
+
+class CachedSummaryBufferMemory(ConversationSummaryBufferMemory):
+    '''ConversationSummaryBufferMemory whose prune() reuses per-message token counts'''
+    
+    token_counter: Any = None
+    
+    def prune(self) -> None:
+        '''Fold the oldest messages into the summary until the buffer fits max_token_limit'''
+        if self.token_counter is None:
+            self.token_counter = TokenCountCache(self.llm)
+        
+        buffer = self.chat_memory.messages
+        curr_buffer_length = self.token_counter.count(buffer)
+        if curr_buffer_length > self.max_token_limit:
+            pruned_memory = []
+            while buffer and curr_buffer_length > self.max_token_limit:
+                pruned_memory.append(buffer.pop(0))
+                curr_buffer_length = self.token_counter.count(buffer)
+            self.moving_summary_buffer = self.predict_new_summary(pruned_memory, self.moving_summary_buffer)
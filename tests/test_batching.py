@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+
+from utils.batching import amap_batch, map_batch
+
+
+class _Peak:
+    '''Tracks how many calls overlap'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def enter(self):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def leave(self):
+        with self.lock:
+            self.running -= 1
+
+
+def test_map_batch_keeps_input_order_and_limit():
+    peak = _Peak()
+
+    def work(value, delay):
+        peak.enter()
+        time.sleep(delay)
+        peak.leave()
+        return value * 2
+
+    items = [(index, 0.02 * (5 - index)) for index in range(6)]
+    assert map_batch(work, items, limit=2) == [0, 2, 4, 6, 8, 10]
+    assert peak.peak == 2
+
+
+def test_map_batch_empty():
+    assert map_batch(lambda: None, [], limit=4) == []
+
+
+def test_amap_batch_keeps_input_order_and_limit():
+    peak = _Peak()
+
+    async def work(value, delay):
+        peak.enter()
+        await asyncio.sleep(delay)
+        peak.leave()
+        return value * 2
+
+    items = [(index, 0.01 * (5 - index)) for index in range(6)]
+    assert asyncio.run(amap_batch(work, items, limit=3)) == [0, 2, 4, 6, 8, 10]
+    assert peak.peak == 3
@@ -0,0 +1,64 @@
+import time
+
+from utils.conversation_store import ConversationStore
+
+
+def test_get_missing_conversation():
+    store = ConversationStore()
+    assert store.get("c1") is None
+    assert "c1" not in store
+
+
+def test_set_then_get():
+    store = ConversationStore()
+    store.set("c1", {"stage": "A1"})
+    assert store.get("c1") == {"stage": "A1"}
+    assert "c1" in store
+
+
+def test_least_recently_used_is_evicted():
+    store = ConversationStore(maxsize=2)
+    store.set("a", {"n": 1})
+    store.set("b", {"n": 2})
+    store.get("a")  # a is now more recent than b
+    store.set("c", {"n": 3})
+
+    assert store.get("b") is None
+    assert store.get("a") == {"n": 1}
+    assert store.get("c") == {"n": 3}
+
+
+def test_idle_conversations_expire():
+    store = ConversationStore(ttl=0.05)
+    store.set("c1", {"stage": "A1"})
+    time.sleep(0.1)
+    assert store.get("c1") is None
+    assert "c1" not in store._local
+
+
+def test_set_restarts_ttl():
+    store = ConversationStore(ttl=0.1)
+    store.set("c1", {"stage": "A1"})
+    time.sleep(0.06)
+    store.set("c1", {"stage": "A2"})
+    time.sleep(0.06)
+    assert store.get("c1") == {"stage": "A2"}
+
+
+def test_get_returns_independent_copy():
+    store = ConversationStore()
+    store.set("c1", {"messages": [{"role": "user", "content": "hi"}]})
+
+    state = store.get("c1")
+    state["messages"].append({"role": "agent", "content": "hello"})
+    state["messages"][0]["content"] = "changed"
+
+    assert store.get("c1") == {"messages": [{"role": "user", "content": "hi"}]}
+
+
+def test_set_stores_independent_copy():
+    store = ConversationStore()
+    state = {"messages": ["hi"]}
+    store.set("c1", state)
+    state["messages"].append("later")
+    assert store.get("c1") == {"messages": ["hi"]}
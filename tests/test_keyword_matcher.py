@@ -0,0 +1,61 @@
+import pytest
+
+from utils import keyword_matcher
+from utils.keyword_matcher import KeywordMatcher
+
+
+@pytest.fixture(params=["automaton", "fallback"])
+def make_matcher(request, monkeypatch):
+    '''Build matchers on both backends - Aho-Corasick (when installed) and the plain `in` loop'''
+    if request.param == "automaton":
+        if not keyword_matcher.AHOCORASICK_AVAILABLE:
+            pytest.skip("pyahocorasick not installed")
+    else:
+        monkeypatch.setattr(keyword_matcher, "AHOCORASICK_AVAILABLE", False)
+    return KeywordMatcher
+
+
+def test_matches_in_table_order_not_text_order(make_matcher):
+    matcher = make_matcher([("soil", "waste"), ("garden", "waste"), ("book", "booking")])
+    assert matcher.matches("book a skip for garden soil") == [
+        ("soil", "waste"), ("garden", "waste"), ("book", "booking")
+    ]
+
+
+def test_overlapping_keywords_all_match(make_matcher):
+    matcher = make_matcher([("bed", "item"), ("sofa bed", "item"), ("bedroom", "room")])
+    assert matcher.keywords("sofa bedroom") == ["bed", "sofa bed", "bedroom"]
+
+
+def test_keyword_with_several_tags(make_matcher):
+    matcher = make_matcher([("soil", "waste"), ("soil", "heavy"), ("garden", "waste")])
+    assert matcher.matches("soil") == [("soil", "waste"), ("soil", "heavy")]
+    assert matcher.tags("soil and garden") == {"waste", "heavy"}
+    assert matcher.keywords("soil and garden", tag="heavy") == ["soil"]
+
+
+def test_keywords_are_deduplicated(make_matcher):
+    matcher = make_matcher([("soil", "waste"), ("soil", "heavy")])
+    assert matcher.keywords("soil soil") == ["soil"]
+
+
+def test_duplicate_entries_collapse(make_matcher):
+    matcher = make_matcher([("book", "booking"), ("book", "booking")])
+    assert matcher.matches("book it") == [("book", "booking")]
+
+
+def test_case_sensitive_as_documented(make_matcher):
+    matcher = make_matcher([("book", "booking")])
+    assert matcher.matches("BOOK") == []
+
+
+def test_no_match_and_empty_table(make_matcher):
+    assert make_matcher([("book", "booking")]).matches("hello") == []
+    assert make_matcher([]).matches("hello") == []
+
+
+def test_cached_results_are_not_shared_lists(make_matcher):
+    matcher = make_matcher([("book", "booking")], cache_size=16)
+    first = matcher.matches("book it")
+    first.append(("extra", "tag"))
+    assert matcher.matches("book it") == [("book", "booking")]
@@ -0,0 +1,53 @@
+from utils import pricing_cache
+
+BASE_URL = "https://pricing.test"
+
+
+class _Api:
+    '''Stands in for a _send_koyeb_webhook - records calls, answers from a canned list'''
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __call__(self, url, payload, method):
+        self.calls.append((url, dict(payload), method))
+        return self.responses.pop(0)
+
+
+def setup_function():
+    pricing_cache._PRICING_FLIGHTS.clear()
+
+
+def test_price_fields_only_are_cached():
+    api = _Api({"success": True, "price": 250, "booking_ref": "QUOTE-1"})
+    result = pricing_cache.get_pricing(BASE_URL, "ls1 4ap", "skip", "8yd", api)
+
+    assert result == {"success": True, "price": 250, "postcode": "LS14AP", "service": "skip", "type": "8yd"}
+    assert api.calls == [(BASE_URL + "/api/wasteking-get-price", {"postcode": "LS14AP", "service": "skip", "type": "8yd"}, "POST")]
+
+
+def test_lookups_share_one_cache_across_callers():
+    first = _Api({"success": True, "price": 250})
+    second = _Api()
+    pricing_cache.get_pricing(BASE_URL, "LS14AP", "skip", "8yd", first)
+
+    # A different caller (other sender, postcode typed differently) reuses the hit
+    assert pricing_cache.get_pricing(BASE_URL, "LS1 4AP", "skip", "8yd", second)["price"] == 250
+    assert second.calls == []
+    assert pricing_cache.cached_pricing(BASE_URL, "ls1 4ap", "skip", "8yd")["price"] == 250
+
+
+def test_get_fallback_and_failures_not_cached():
+    api = _Api({"success": False}, {"success": False}, {"success": False}, {"success": True, "price": 90})
+    assert pricing_cache.get_pricing(BASE_URL, "M11AB", "mav", "6yd", api)["success"] is False
+    assert [method for _, _, method in api.calls] == ["POST", "GET"]
+    assert pricing_cache.cached_pricing(BASE_URL, "M11AB", "mav", "6yd") is None
+
+    assert pricing_cache.get_pricing(BASE_URL, "M11AB", "mav", "6yd", api)["price"] == 90
+
+
+def test_returned_dicts_are_copies():
+    api = _Api({"success": True, "price": 250})
+    pricing_cache.get_pricing(BASE_URL, "LS14AP", "skip", "8yd", api)["supplier_name"] = "changed"
+    assert "supplier_name" not in pricing_cache.cached_pricing(BASE_URL, "LS14AP", "skip", "8yd")
@@ -0,0 +1,154 @@
+import threading
+import time
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def _start_follower(flight, key, fn, results):
+    def follow():
+        try:
+            results.append(flight.call(key, fn))
+        except Exception as e:
+            results.append(e)
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    return thread
+
+
+def _wait_for_inflight(flight, key):
+    for _ in range(500):
+        if key in flight._inflight:
+            return
+        time.sleep(0.001)
+    raise AssertionError("leader never went in flight")
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight(ttl=0)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"price": 250}
+
+    leader_results = []
+    leader = _start_follower(flight, "k", slow, leader_results)
+    assert started.wait(5)
+
+    follower_results = []
+    follower = _start_follower(flight, "k", slow, follower_results)
+    time.sleep(0.05)  # follower is now waiting on the leader's future
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert calls == [1]
+    assert leader_results == follower_results == [{"price": 250}]
+
+
+def test_leader_exception_reaches_followers_and_is_not_cached():
+    flight = SingleFlight(ttl=60)
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise ValueError("api down")
+
+    leader_results = []
+    leader = _start_follower(flight, "k", failing, leader_results)
+    assert started.wait(5)
+    _wait_for_inflight(flight, "k")
+
+    follower_results = []
+    follower = _start_follower(flight, "k", failing, follower_results)
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert isinstance(leader_results[0], ValueError)
+    assert isinstance(follower_results[0], ValueError)
+    assert flight.peek("k") is None
+    assert flight.call("k", lambda: "recovered") == "recovered"
+
+
+def test_results_are_cached_for_ttl():
+    flight = SingleFlight(ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return "price"
+
+    assert flight.call("k", fetch) == "price"
+    assert flight.call("k", fetch) == "price"
+    assert calls == [1]
+
+
+def test_cache_if_rejects_results():
+    flight = SingleFlight(ttl=60)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"success": False}
+
+    flight.call("k", fetch, cache_if=lambda r: r["success"])
+    flight.call("k", fetch, cache_if=lambda r: r["success"])
+    assert len(calls) == 2
+    assert flight.peek("k") is None
+
+
+def test_ttl_expiry_and_peek():
+    flight = SingleFlight(ttl=0.05)
+    assert flight.peek("k") is None
+
+    flight.call("k", lambda: "price")
+    assert flight.peek("k") == "price"
+
+    time.sleep(0.1)
+    assert flight.peek("k") is None
+    assert flight.call("k", lambda: "fresh") == "fresh"
+
+
+def test_peek_never_calls_or_waits():
+    flight = SingleFlight(ttl=60)
+    release = threading.Event()
+    leader = _start_follower(flight, "k", lambda: release.wait(5) and "slow", [])
+    _wait_for_inflight(flight, "k")
+
+    started = time.monotonic()
+    assert flight.peek("k") is None
+    assert time.monotonic() - started < 1
+    release.set()
+    leader.join(5)
+
+
+def test_oldest_results_evicted_past_maxsize():
+    flight = SingleFlight(ttl=60, maxsize=2)
+    for key in ("a", "b", "c"):
+        flight.call(key, lambda key=key: key)
+    assert flight.peek("a") is None
+    assert flight.peek("b") == "b"
+    assert flight.peek("c") == "c"
+
+
+def test_clear_drops_cached_results():
+    flight = SingleFlight(ttl=60)
+    flight.call("k", lambda: "price")
+    flight.clear()
+    assert flight.peek("k") is None
+
+
+@pytest.mark.parametrize("ttl", [0, -1])
+def test_non_positive_ttl_disables_caching(ttl):
+    flight = SingleFlight(ttl=ttl)
+    flight.call("k", lambda: "price")
+    assert flight.peek("k") is None
@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+from utils.state_manager import ConversationState, StateManager
+
+
+def _stored(db_path, conversation_id):
+    '''The row as committed - a fresh manager has nothing buffered'''
+    return StateManager(str(db_path)).get_state(conversation_id)
+
+
+def _manager(tmp_path, **kwargs):
+    return StateManager(str(tmp_path / "states.db"), **kwargs)
+
+
+def test_first_save_in_quiet_period_is_written_immediately(tmp_path):
+    manager = _manager(tmp_path, flush_interval=60)
+    manager.save_state(ConversationState("c1", current_agent="skip"))
+    assert _stored(manager.db_path, "c1").current_agent == "skip"
+
+
+def test_saves_in_window_are_buffered_until_timer(tmp_path):
+    manager = _manager(tmp_path, flush_interval=0.05)
+    manager.save_state(ConversationState("c1", current_agent="skip"))
+    manager.save_state(ConversationState("c1", current_agent="grab"))
+
+    assert _stored(manager.db_path, "c1").current_agent == "skip"
+    assert manager.get_state("c1").current_agent == "grab"
+
+    time.sleep(0.3)
+    assert _stored(manager.db_path, "c1").current_agent == "grab"
+
+
+def test_timer_window_closes_when_idle(tmp_path):
+    manager = _manager(tmp_path, flush_interval=0.05)
+    manager.save_state(ConversationState("c1"))
+    time.sleep(0.3)
+    assert manager._flush_timer is None
+
+
+def test_full_batch_is_written_without_waiting_for_timer(tmp_path):
+    manager = _manager(tmp_path, flush_interval=60, flush_batch_size=3)
+    manager.save_state(ConversationState("opener"))  # opens the window
+    for index in range(3):
+        manager.save_state(ConversationState(f"c{index}", current_agent="skip"))
+
+    assert manager._dirty == {}
+    for index in range(3):
+        assert _stored(manager.db_path, f"c{index}").current_agent == "skip"
+
+
+def test_durable_save_bypasses_buffer(tmp_path):
+    manager = _manager(tmp_path, flush_interval=60)
+    manager.save_state(ConversationState("opener"))
+    manager.save_state(ConversationState("c1", booking_ref="WK-1"), durable=True)
+    assert _stored(manager.db_path, "c1").booking_ref == "WK-1"
+
+
+def test_flush_writes_everything_buffered(tmp_path):
+    manager = _manager(tmp_path, flush_interval=60)
+    manager.save_state(ConversationState("opener"))
+    manager.save_state(ConversationState("c1", pricing_given=True))
+    manager.flush()
+    assert _stored(manager.db_path, "c1").pricing_given is True
+
+
+def test_state_being_written_stays_visible(tmp_path):
+    manager = _manager(tmp_path, flush_interval=60)
+    manager.save_state(ConversationState("opener"))
+    manager.save_state(ConversationState("c1", current_agent="grab"))
+
+    writing, release = threading.Event(), threading.Event()
+    write_states = manager._write_states
+
+    def slow_write(states):
+        writing.set()
+        release.wait(5)
+        write_states(states)
+
+    manager._write_states = slow_write
+    flusher = threading.Thread(target=manager.flush)
+    flusher.start()
+    try:
+        assert writing.wait(5)
+        # Taken from the buffer but not committed - must not fall back to the old row
+        assert manager.get_state("c1").current_agent == "grab"
+    finally:
+        release.set()
+        flusher.join(5)
+
+    assert manager._inflight == {}
+    assert _stored(manager.db_path, "c1").current_agent == "grab"
+
+
+def test_failed_write_is_kept_for_next_flush(tmp_path):
+    manager = _manager(tmp_path, flush_interval=60)
+    manager.save_state(ConversationState("opener"))
+    manager.save_state(ConversationState("c1", current_agent="grab"))
+
+    def failing_write(states):
+        raise OSError("disk full")
+
+    write_states, manager._write_states = manager._write_states, failing_write
+    with pytest.raises(OSError):
+        manager.flush()
+    manager._write_states = write_states
+
+    assert manager.get_state("c1").current_agent == "grab"
+    manager.flush()
+    assert _stored(manager.db_path, "c1").current_agent == "grab"
+
+
+def test_buffered_state_is_read_and_saved_as_a_copy(tmp_path):
+    manager = _manager(tmp_path, flush_interval=60)
+    manager.save_state(ConversationState("opener"))
+    state = ConversationState("c1", customer_data={"postcode": "LS14AP"})
+    manager.save_state(state)
+    state.customer_data["postcode"] = "M11AB"
+
+    read = manager.get_state("c1")
+    read.customer_data["phone"] = "07123456789"
+    read.current_agent = "skip"
+
+    # Same as reading the committed row after a flush - unsaved edits never reach the write
+    manager.flush()
+    stored = _stored(manager.db_path, "c1")
+    assert stored.customer_data == {"postcode": "LS14AP"}
+    assert stored.current_agent is None
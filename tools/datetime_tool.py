@@ -2,6 +2,17 @@ from datetime import datetime, timedelta
 from typing import Dict, Any
 from langchain.tools import BaseTool
 
+# Office hours by weekday (Monday=0): (opens, closes) in decimal hours, display string
+_OFFICE_HOURS = (
+    (8, 17, "8:00am-5:00pm"),    # Monday
+    (8, 17, "8:00am-5:00pm"),    # Tuesday
+    (8, 17, "8:00am-5:00pm"),    # Wednesday
+    (8, 17, "8:00am-5:00pm"),    # Thursday
+    (8, 16.5, "8:00am-4:30pm"),  # Friday
+    (9, 12, "9:00am-12:00pm"),   # Saturday
+    (0, 0, "Closed"),            # Sunday
+)
+
 class DateTimeTool(BaseTool):
     name: str = "datetime"
     description: str = "Get current date/time and check office hours"
@@ -13,29 +24,17 @@ class DateTimeTool(BaseTool):
         
         return {
             "current_date": now.strftime("%Y-%m-%d"),
-            "current_time": now.strftime("%H:%M"),
-            "current_day": now.strftime("%A"),
+            "current_time": office_hours_info["current_time"],
+            "current_day": office_hours_info["day"],
             "tomorrow_date": (now + timedelta(days=1)).strftime("%Y-%m-%d"),
             "office_hours": office_hours_info["status"],
             "office_hours_details": office_hours_info
         }
     
     def _check_office_hours(self, dt: datetime) -> Dict[str, Any]:
-        weekday = dt.weekday()
+        opens, closes, hours = _OFFICE_HOURS[dt.weekday()]
         hour = dt.hour + (dt.minute / 60.0)
-        
-        if weekday < 4:  # Monday-Thursday
-            is_open = 8 <= hour < 17
-            hours = "8:00am-5:00pm"
-        elif weekday == 4:  # Friday
-            is_open = 8 <= hour < 16.5
-            hours = "8:00am-4:30pm"
-        elif weekday == 5:  # Saturday
-            is_open = 9 <= hour < 12
-            hours = "9:00am-12:00pm"
-        else:  # Sunday
-            is_open = False
-            hours = "Closed"
+        is_open = opens <= hour < closes
         
         return {
             "status": "open" if is_open else "closed",
@@ -1,12 +1,12 @@
 import requests
 import json
 import os
-import time
-import re
 from typing import Dict, Any, Optional
 from langchain.tools import BaseTool
 from pydantic import Field
 from agents.elevenlabs_supplier_caller import ElevenLabsSupplierCaller
+from utils.serialization import dumps
+from utils import pricing_cache
 
 class SMPAPITool(BaseTool):
     name: str = "smp_api"
@@ -16,7 +16,7 @@ class SMPAPITool(BaseTool):
     def _run(self, action: str, **kwargs) -> Dict[str, Any]:
         print(f"\n🔧 ==================== SMP API TOOL CALLED ====================")
         print(f"🔧 ACTION: {action}")
-        print(f"🔧 PARAMETERS: {json.dumps(kwargs, indent=2)}")
+        print(f"🔧 PARAMETERS: {dumps(kwargs)}")
         print(f"🔧 KOYEB URL: {self.koyeb_url}")
         
         try:
@@ -38,7 +38,7 @@ class SMPAPITool(BaseTool):
                 result = {"success": False, "error": f"Unknown action: {action}"}
             
             print(f"🔧 TOOL RESULT:")
-            print(f"🔧 {json.dumps(result, indent=2)}")
+            print(f"🔧 {dumps(result)}")
             print(f"🔧 ==================== SMP API TOOL FINISHED ====================\n")
             
             return result
@@ -52,7 +52,7 @@ class SMPAPITool(BaseTool):
     def _send_koyeb_webhook(self, url, data_payload, method="POST"):
         try:
             print(f"🔄 SMP API TOOL: Sending {method} to: {url}")
-            print(f"🔄 Payload: {json.dumps(data_payload, indent=2)}")
+            print(f"🔄 Payload: {dumps(data_payload)}")
             print(f"🔧 SMP API TOOL: TOOL CALL - requests.{method.lower()}()")
             
             if method.upper() == "GET":
@@ -63,7 +63,7 @@ class SMPAPITool(BaseTool):
             print(f"🔄 Response status: {response.status_code}")
             print(f"🔄 Response text: {response.text}")
             
-            if response.status_code in [200, 201]:
+            if response.status_code in {200, 201}:
                 try:
                     return response.json()
                 except json.JSONDecodeError:
@@ -86,33 +86,26 @@ class SMPAPITool(BaseTool):
         if not postcode or not service or not type:
             return {"success": False, "error": "Missing required parameters"}
         
-        # Clean postcode
-        postcode = postcode.upper().strip().replace(' ', '')
-        print(f"   📍 Clean Postcode: {postcode}")
-        
-        payload = {"postcode": postcode, "service": service, "type": type}
-        url = f"{self.koyeb_url}/api/wasteking-get-price"
-        
-        # Try POST first
-        response = self._send_koyeb_webhook(url, payload, "POST")
-        
-        # If POST fails, try GET
-        if not response.get("success"):
-            response = self._send_koyeb_webhook(url, payload, "GET")
-        
-        if response.get("success"):
-            return {
-                "success": True,
-                "booking_ref": response.get('booking_ref'),
-                "price": response.get('price'),
-                "real_supplier_phone": os.getenv('SUPPLIER_PHONE', '+44XXXXXXXXXX'),
-                "supplier_name": os.getenv('SUPPLIER_NAME', 'Local Supplier'),
-                "postcode": postcode,
-                "service": service,
-                "type": type
-            }
+        print(f"   📍 Clean Postcode: {pricing_cache.clean_postcode(postcode)}")
         
-        return {"success": False, "message": "No pricing available"}
+        result = pricing_cache.get_pricing(self.koyeb_url, postcode, service, type, self._send_koyeb_webhook)
+        if result.get("success"):
+            result["real_supplier_phone"] = os.getenv('SUPPLIER_PHONE', '+44XXXXXXXXXX')
+            result["supplier_name"] = os.getenv('SUPPLIER_NAME', 'Local Supplier')
+        return result
+    
+    def cached_pricing(self, postcode: str, service: str, type: str) -> Optional[Dict[str, Any]]:
+        """Price from a recent successful lookup, or None - no API call"""
+        return pricing_cache.cached_pricing(self.koyeb_url, postcode, service, type)
+    
+    def create_booking(self, postcode: str, service: str, type: str, firstName: str, phone: str,
+                       booking_ref: str, **kwargs) -> Dict[str, Any]:
+        """Booking quote and payment link for a customer, without going through the agent"""
+        try:
+            return self._create_booking_quote1(postcode=postcode, service=service, type=type, firstName=firstName,
+                                               phone=phone, booking_ref=booking_ref, **kwargs)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
     
     def _create_booking_quote1(self, **kwargs) -> Dict[str, Any]:
         
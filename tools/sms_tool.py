@@ -9,6 +9,10 @@ try:
 except ImportError:
     TWILIO_AVAILABLE = False
 
+# Phone normalisation patterns, compiled once
+_PHONE_JUNK_RE = re.compile(r'[^\d+]')
+_UK_MOBILE_RE = re.compile(r'^\+447\d{9}$')
+
 class SMSTool(BaseTool):
     name: str = "sms"
     description: str = "Send SMS messages via Twilio"
@@ -168,7 +172,7 @@ Questions? Reply HELP"""
             return {"valid": False, "error": "No phone number provided"}
         
         # Remove spaces and non-digit characters except +
-        cleaned = re.sub(r'[^\d+]', '', phone)
+        cleaned = _PHONE_JUNK_RE.sub('', phone)
         
         # Handle different UK phone formats
         if cleaned.startswith('07'):
@@ -182,7 +186,7 @@ Questions? Reply HELP"""
             cleaned = f"+44{cleaned}"
         
         # Validate UK mobile number format
-        if not re.match(r'^\+447\d{9}$', cleaned):
+        if not _UK_MOBILE_RE.match(cleaned):
             return {
                 "valid": False, 
                 "error": f"Invalid UK mobile number format: {phone}. Expected format: 07xxxxxxxxx"
@@ -0,0 +1,31 @@
+from typing import Any, Dict, List, Tuple
+from langchain.agents import AgentExecutor, create_openai_functions_agent
+from langchain.tools import BaseTool
+from langchain.prompts import ChatPromptTemplate
+
+# Agent runnables shared by every agent instance built from the same llm, tools and prompt.
+# Entries hold the key objects so their ids stay valid; agents carry no per-session state.
+_AGENTS: Dict[Tuple, Tuple[Tuple, Any]] = {}
+# Agent + executor shared the same way, per executor settings
+_EXECUTORS: Dict[Tuple, Tuple[Tuple, Any, AgentExecutor]] = {}
+
+def get_agent(llm, tools: List[BaseTool], prompt: ChatPromptTemplate) -> Any:
+    '''Functions agent for this llm/tools/prompt combination, built on first use -
+    for callers that need their own executor (e.g. one with conversation memory)'''
+    key = (id(llm), id(prompt), *map(id, tools))
+    entry = _AGENTS.get(key)
+    if entry is None:
+        agent = create_openai_functions_agent(llm=llm, tools=tools, prompt=prompt)
+        entry = _AGENTS[key] = ((llm, prompt, tuple(tools)), agent)
+    return entry[1]
+
+def get_agent_executor(llm, tools: List[BaseTool], prompt: ChatPromptTemplate,
+                       max_iterations: int, verbose: bool = False) -> Tuple[Any, AgentExecutor]:
+    '''(agent, executor) for this llm/tools/prompt combination, built on first use'''
+    key = (id(llm), id(prompt), max_iterations, verbose, *map(id, tools))
+    entry = _EXECUTORS.get(key)
+    if entry is None:
+        agent = get_agent(llm, tools, prompt)
+        executor = AgentExecutor(agent=agent, tools=tools, verbose=verbose, max_iterations=max_iterations)
+        entry = _EXECUTORS[key] = ((llm, prompt, tuple(tools)), agent, executor)
+    return entry[1], entry[2]
@@ -0,0 +1,20 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, List, Sequence, Tuple
+
+def map_batch(fn: Callable[..., Any], items: Sequence[Tuple], limit: int) -> List[Any]:
+    '''fn(*item) for every item on up to limit threads - results in input order'''
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=min(len(items), limit)) as pool:
+        return list(pool.map(lambda item: fn(*item), items))
+
+async def amap_batch(fn: Callable[..., Awaitable[Any]], items: Sequence[Tuple], limit: int) -> List[Any]:
+    '''await fn(*item) for every item, at most limit at once - results in input order'''
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(item: Tuple) -> Any:
+        async with semaphore:
+            return await fn(*item)
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
@@ -0,0 +1,76 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from utils.serialization import dumps, loads
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+class ConversationStore:
+    '''Conversation state keyed by conversation id - kept in Redis with a TTL when
+    REDIS_URL is set and reachable, so every worker sees the same conversations and
+    idle ones expire; an in-process LRU of at most maxsize conversations otherwise
+    (local dev), with the same idle TTL, so a long-running worker does not grow without bound.
+
+    get() returns a deep copy (as Redis does by deserialising), so callers can mutate it,
+    nested lists included, freely until they set() it back; set() stores a deep copy too.
+    '''
+
+    def __init__(self, redis_url: str = '', ttl: int = 3600, prefix: str = 'conversation:', maxsize: int = 10000):
+        self.ttl = ttl
+        self.prefix = prefix
+        self.maxsize = maxsize
+        self._local: 'OrderedDict[str, Tuple[float, Dict[str, Any]]]' = OrderedDict()  # id -> (expiry, state)
+        self._lock = threading.Lock()
+        self._redis = None
+
+        if redis_url and REDIS_AVAILABLE:
+            try:
+                client = redis.Redis.from_url(redis_url)
+                client.ping()
+                self._redis = client
+                print(f"✅ CONVERSATION STORE: Redis ({ttl}s TTL)")
+            except redis.RedisError as e:
+                print(f"❌ CONVERSATION STORE: Redis unreachable, using in-process dict: {e}")
+        elif redis_url:
+            print("❌ CONVERSATION STORE: redis package not installed, using in-process dict")
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        '''Stored state for the conversation, or None'''
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(self.prefix + conversation_id)
+                return loads(raw) if raw else None
+            except redis.RedisError as e:
+                print(f"❌ CONVERSATION STORE: Redis read failed: {e}")
+        with self._lock:
+            entry = self._local.get(conversation_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._local[conversation_id]
+                return None
+            self._local.move_to_end(conversation_id)
+            return copy.deepcopy(entry[1])
+
+    def set(self, conversation_id: str, state: Dict[str, Any]):
+        '''Store state for the conversation, resetting its TTL'''
+        if self._redis is not None:
+            try:
+                self._redis.setex(self.prefix + conversation_id, self.ttl, dumps(state))
+                return
+            except redis.RedisError as e:
+                print(f"❌ CONVERSATION STORE: Redis write failed: {e}")
+        with self._lock:
+            self._local[conversation_id] = (time.monotonic() + self.ttl, copy.deepcopy(state))
+            self._local.move_to_end(conversation_id)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return self.get(conversation_id) is not None
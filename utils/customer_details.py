@@ -0,0 +1,125 @@
+import re
+from typing import Any, Dict, Optional, Set
+
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+
+def _compile(pattern: str, flags: int = 0):
+    '''Possessive quantifiers (\\w++) need Python 3.11+ re; older versions get the plain greedy form'''
+    try:
+        return re.compile(pattern, flags)
+    except re.error:
+        return re.compile(_greedy(pattern), flags)
+
+def _greedy(pattern: str) -> str:
+    return pattern.replace('++', '+')
+
+# Postcodes recognised even when written with a space (the general pattern needs them unspaced)
+_KNOWN_POSTCODES = ('M1 1AB',)
+
+# Extraction patterns - compiled once at import, tried in order.
+# Postcodes match in any case and are uppercased after, so the message is never copied.
+_POSTCODE_PATTERNS = [
+    re.compile(r'\b([A-Z]{1,2}\d{1,2}[A-Z]?\d[A-Z]{2})\b', re.IGNORECASE),
+    re.compile('|'.join(re.escape(postcode).replace('\\ ', '\\s*') for postcode in _KNOWN_POSTCODES), re.IGNORECASE),
+]
+# Possessive runs never give characters back, so "name" + a long word fails in linear time
+_NAME_PATTERNS = [
+    _compile(pattern, re.IGNORECASE) for pattern in (
+        r'name is ([A-Za-z]++)',
+        r'[Nn]ame\s++([A-Za-z]++\s++[A-Za-z]++)',
+        r'[Nn]ame\s++(\w++)',
+        r'i\'m (\w++)',
+        r'call me (\w++)'
+    )
+]
+_PHONE_PATTERNS = [
+    re.compile(r'payment link to (\d{11})'),
+    re.compile(r'link to (\d{11})'),
+    re.compile(r'to (\d{11})'),
+    re.compile(r'\b(07\d{9})\b'),
+    re.compile(r'\b(\d{11})\b'),
+]
+
+# Name and phone patterns both run on the raw message, so a single scan finds which of them can match
+_SCAN_PATTERNS = _NAME_PATTERNS + _PHONE_PATTERNS
+
+def _build_scan_database():
+    '''One Hyperscan database over the name + phone patterns (ids = index in _SCAN_PATTERNS)'''
+    if not HYPERSCAN_AVAILABLE:
+        return None
+    base_flags = hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP | hyperscan.HS_FLAG_SINGLEMATCH
+    database = hyperscan.Database()
+    database.compile(
+        # Hyperscan has no possessive syntax (and never backtracks), so it gets the greedy form
+        expressions=[_greedy(pattern.pattern).encode() for pattern in _SCAN_PATTERNS],
+        ids=list(range(len(_SCAN_PATTERNS))),
+        elements=len(_SCAN_PATTERNS),
+        flags=[
+            base_flags | (hyperscan.HS_FLAG_CASELESS if pattern.flags & re.IGNORECASE else 0)
+            for pattern in _SCAN_PATTERNS
+        ]
+    )
+    return database
+
+_SCAN_DATABASE = _build_scan_database()
+
+def _matching_patterns(message: str) -> Optional[Set[int]]:
+    '''Indices into _SCAN_PATTERNS that match somewhere in message, or None without Hyperscan'''
+    if _SCAN_DATABASE is None:
+        return None
+    hits = set()
+    _SCAN_DATABASE.scan(message.encode(), match_event_handler=lambda pattern_id, *_: hits.add(pattern_id))
+    return hits
+
+def _find_postcode(message: str) -> Optional[str]:
+    '''First usable postcode across all patterns - later patterns are not scanned once one is found'''
+    for pattern in _POSTCODE_PATTERNS:
+        for match in pattern.finditer(message):
+            clean = match.group().upper().strip().replace(' ', '')
+            if len(clean) >= 5:
+                return clean
+    return None
+
+def extract_customer_details(message: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    '''Fill postcode, firstName and phone found in message into data (shared by skip and grab agents).
+    Slots already present in data (e.g. from context) are kept and their patterns skipped.'''
+    # Postcodes need at least 2 digits and phones 11 - most turns ("yes please") have none
+    digit_count = sum(map(str.isdigit, message))
+    need_name = not data.get('firstName')
+    need_phone = not data.get('phone') and digit_count >= 11
+    # With Hyperscan, one pass tells us which name/phone patterns are worth running
+    hits = _matching_patterns(message) if need_name or need_phone else None
+    
+    if not data.get('postcode') and digit_count >= 2:
+        clean = _find_postcode(message)
+        if clean:
+            data['postcode'] = clean
+            print(f"✅ FOUND POSTCODE: {clean}")
+    
+    if need_name:
+        for index, pattern in enumerate(_NAME_PATTERNS):
+            if hits is not None and index not in hits:
+                continue
+            match = pattern.search(message)
+            if match:
+                name = match.group(1).strip().title()
+                data['firstName'] = name
+                print(f"✅ FOUND NAME: {name}")
+                break
+    
+    if need_phone:
+        for index, pattern in enumerate(_PHONE_PATTERNS, len(_NAME_PATTERNS)):
+            if hits is not None and index not in hits:
+                continue
+            match = pattern.search(message)
+            if match:
+                phone = match.group(1)
+                data['phone'] = phone
+                print(f"✅ FOUND PHONE: {phone}")
+                break
+    
+    return data
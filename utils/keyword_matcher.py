@@ -0,0 +1,60 @@
+import functools
+from typing import Any, Dict, Hashable, Iterable, List, Set, Tuple
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+class KeywordMatcher:
+    '''Substring matcher for a fixed keyword table - a single Aho-Corasick pass
+    over the text when pyahocorasick is installed, a plain `in` loop otherwise.
+
+    Entries are (keyword, tag) pairs; a keyword may carry several tags. Keywords
+    are matched as-is, so callers pass text in the same case as the table.
+    With cache_size, results for the most recent distinct texts are memoised -
+    worth it for chat turns, where "yes" / "book it" / "ok" recur constantly.
+    '''
+
+    def __init__(self, entries: Iterable[Tuple[str, Hashable]], cache_size: int = 0):
+        self.entries: List[Tuple[str, Hashable]] = list(dict.fromkeys(entries))
+        self._order = {entry: index for index, entry in enumerate(self.entries)}
+        self._automaton = None
+
+        if AHOCORASICK_AVAILABLE and self.entries:
+            by_keyword: Dict[str, List[Tuple[str, Hashable]]] = {}
+            for keyword, tag in self.entries:
+                by_keyword.setdefault(keyword, []).append((keyword, tag))
+
+            self._automaton = ahocorasick.Automaton()
+            for keyword, keyword_entries in by_keyword.items():
+                self._automaton.add_word(keyword, tuple(keyword_entries))
+            self._automaton.make_automaton()
+
+        if cache_size:
+            self._scan = functools.lru_cache(maxsize=cache_size)(self._scan)
+
+    def matches(self, text: str) -> List[Tuple[str, Hashable]]:
+        '''(keyword, tag) entries found in text, in table order'''
+        return list(self._scan(text))
+
+    def _scan(self, text: str) -> Tuple[Tuple[str, Hashable], ...]:
+        if self._automaton is None:
+            return tuple(entry for entry in self.entries if entry[0] in text)
+
+        found = set()
+        for _, keyword_entries in self._automaton.iter(text):
+            found.update(keyword_entries)
+        return tuple(sorted(found, key=self._order.__getitem__))
+
+    def keywords(self, text: str, tag: Any = None) -> List[str]:
+        '''Keywords found in text (optionally only those with the given tag), in table order'''
+        return list(dict.fromkeys(
+            keyword for keyword, keyword_tag in self.matches(text)
+            if tag is None or keyword_tag == tag
+        ))
+
+    def tags(self, text: str) -> Set[Hashable]:
+        '''Set of tags whose keywords occur in text'''
+        return {tag for _, tag in self.matches(text)}
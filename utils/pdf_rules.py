@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Tuple
+
+try:
+    import pypdfium2
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+try:
+    import PyPDF2
+    PYPDF2_AVAILABLE = True
+except ImportError:
+    PYPDF2_AVAILABLE = False
+
+RULES_PDF_PATH = "data/rules/all rules.pdf"
+
+# (pdf path, mtime_ns, size) -> extracted text, shared by every agent in the process
+_TEXT_CACHE: Dict[Tuple[str, int, int], str] = {}
+_TEXT_LOCK = threading.Lock()
+
+# Literal braces in PDF text would otherwise be read as template variables
+_BRACE_ESCAPES = str.maketrans({"{": "{{", "}": "}}"})
+
+def rules_prompt_prefix(pdf_rules: str) -> str:
+    '''Rules block that opens every agent system prompt. It is byte-identical across
+    agents and comes before anything agent-specific, so the provider's prompt
+    prefix cache (OpenAI caches prefixes over 1024 tokens) is shared by all of them.
+    Braces are escaped in one translate pass, as the block is a template fragment.'''
+    return f"RULES FROM PDF KNOWLEDGE BASE:\n{pdf_rules.translate(_BRACE_ESCAPES)}\n\n"
+
+def _cache_path(pdf_path: str) -> str:
+    return pdf_path + ".cache"
+
+def _prebuilt_path(pdf_path: str) -> str:
+    return pdf_path + ".txt"
+
+def _content_header(pdf_path: str) -> str:
+    '''First line of the prebuilt text - sha256 of the PDF, which (unlike mtime) survives a checkout'''
+    with open(pdf_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest() + "\n"
+
+def _extract_text(pdf_path: str) -> str:
+    '''Only reached on a cache miss - a deploy with a fresh <pdf>.cache never needs a PDF library.
+    PDFium (C++) when pypdfium2 is installed, pure-Python PyPDF2 otherwise.'''
+    if PDFIUM_AVAILABLE:
+        return _extract_text_pdfium(pdf_path)
+    if not PYPDF2_AVAILABLE:
+        raise OSError(f"No PDF library installed and no text cache for {pdf_path}")
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        # One join over all pages rather than growing a string page by page
+        return "".join([page.extract_text() for page in pdf_reader.pages])
+
+def _cache_header(signature: Tuple[int, int]) -> str:
+    '''First line of the cache file - the (mtime_ns, size) of the PDF it was made from'''
+    return "%d %d\n" % signature
+
+def _extract_text_pdfium(pdf_path: str) -> str:
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        pages = [pdf[index].get_textpage().get_text_range() for index in range(len(pdf))]
+    finally:
+        pdf.close()
+    # PDFium ends lines with CRLF; PyPDF2 (and every phrase lookup) uses LF
+    return "\n".join(pages).replace("\r\n", "\n")
+
+def _read_disk_cache(pdf_path: str, signature: Tuple[int, int]) -> str:
+    '''Cached text if the cache was written for this exact PDF (mtime_ns and size), else None'''
+    cache_path = _cache_path(pdf_path)
+    try:
+        with open(cache_path, 'r', encoding='utf-8', newline='') as f:
+            if f.readline() != _cache_header(signature):
+                return None
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+def _read_prebuilt(pdf_path: str) -> str:
+    '''Text shipped next to the PDF (<pdf>.txt) if it was built from this exact PDF, else None'''
+    try:
+        with open(_prebuilt_path(pdf_path), 'r', encoding='utf-8', newline='') as f:
+            if f.readline() != _content_header(pdf_path):
+                return None
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+def build_prebuilt_text(pdf_path: str = RULES_PDF_PATH) -> str:
+    '''Extract the PDF and write <pdf>.txt for shipping with the repo - rerun when the PDF changes'''
+    text = _extract_text(pdf_path)
+    with open(_prebuilt_path(pdf_path), 'w', encoding='utf-8', newline='') as f:
+        f.write(_content_header(pdf_path))
+        f.write(text)
+    return _prebuilt_path(pdf_path)
+
+def _write_disk_cache(pdf_path: str, signature: Tuple[int, int], text: str):
+    '''Best effort - a read-only deploy just parses the PDF on each start'''
+    cache_path = _cache_path(pdf_path)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(_cache_header(signature))
+            f.write(text)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️ PDF RULES: Could not write text cache {cache_path}: {e}")
+
+def load_pdf_text(pdf_path: str = RULES_PDF_PATH) -> str:
+    '''Extracted text of a rules PDF.
+
+    Parsed at most once per process; the text is also kept next to the PDF
+    (<pdf>.cache, stamped with the PDF's mtime_ns and size) so new workers skip
+    PDF decoding while the PDF is unchanged. A fresh checkout starts from the
+    prebuilt <pdf>.txt shipped with the repo (see build_prebuilt_text), so PDF
+    decoding only happens when the PDF has changed since it was built.
+    Raises OSError if the PDF cannot be read.
+    '''
+    stat = os.stat(pdf_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    key = (pdf_path, *signature)
+    
+    text = _TEXT_CACHE.get(key)
+    if text is not None:
+        return text
+    
+    with _TEXT_LOCK:
+        text = _TEXT_CACHE.get(key)
+        if text is None:
+            text = _read_disk_cache(pdf_path, signature)
+            if text is None:
+                text = _read_prebuilt(pdf_path)
+                if text is None:
+                    text = _extract_text(pdf_path)
+                _write_disk_cache(pdf_path, signature, text)
+            _TEXT_CACHE[key] = text
+    return text
+
+def load_agent_rules(agent_label: str, service_label: str, pdf_path: str = RULES_PDF_PATH) -> str:
+    '''Rules text for an agent prompt - a short placeholder if the PDF is missing or unreadable'''
+    try:
+        print(f"🔧 {agent_label}: Loading PDF rules from: {pdf_path}")
+        if os.path.exists(pdf_path):
+            text = load_pdf_text(pdf_path)
+            print(f"🔧 {agent_label}: PDF rules loaded successfully ({len(text)} characters)")
+            return text
+        else:
+            print(f"❌ {agent_label}: PDF rules not found at {pdf_path}")
+            return f"PDF rules not found - using basic {service_label} rules"
+    except Exception as e:
+        print(f"❌ {agent_label}: Error loading PDF rules: {e}")
+        return f"PDF rules not available - using basic {service_label} rules"
+
+if __name__ == '__main__':
+    print(f"✅ PDF RULES: Wrote {build_prebuilt_text()}")
@@ -0,0 +1,51 @@
+from typing import Any, Callable, Dict, Optional
+from utils.singleflight import SingleFlight
+from config.settings import settings
+
+# One cache for every /api/wasteking-get-price lookup (SMP tool and orchestrator alike): identical
+# lookups share one in-flight request and successful prices are reused for PRICING_CACHE_TTL seconds
+_PRICING_FLIGHTS = SingleFlight(ttl=settings.PRICING_CACHE_TTL)
+
+# send(url, payload, method) -> parsed webhook response dict
+Sender = Callable[[str, Dict[str, Any], str], Dict[str, Any]]
+
+def clean_postcode(postcode: str) -> str:
+    return postcode.upper().strip().replace(' ', '')
+
+def get_pricing(base_url: str, postcode: str, service: str, type: str, send: Sender) -> Dict[str, Any]:
+    '''Price for postcode/service/type - from the shared cache, else fetched through send'''
+    postcode = clean_postcode(postcode)
+    result = _PRICING_FLIGHTS.call(
+        (base_url, postcode, service, type),
+        _fetch_pricing, base_url, postcode, service, type, send,
+        cache_if=lambda r: r.get("success")
+    )
+    return dict(result)
+
+def cached_pricing(base_url: str, postcode: str, service: str, type: str) -> Optional[Dict[str, Any]]:
+    '''Price from a recent successful lookup, or None - no API call'''
+    result = _PRICING_FLIGHTS.peek((base_url, clean_postcode(postcode), service, type))
+    return dict(result) if result is not None else None
+
+def _fetch_pricing(base_url: str, postcode: str, service: str, type: str, send: Sender) -> Dict[str, Any]:
+    payload = {"postcode": postcode, "service": service, "type": type}
+    url = f"{base_url}/api/wasteking-get-price"
+
+    # Try POST first
+    response = send(url, payload, "POST")
+
+    # If POST fails, try GET
+    if not response.get("success"):
+        response = send(url, payload, "GET")
+
+    # Cached and shared across customers - price fields only, never the API's per-quote booking_ref
+    if response.get("success"):
+        return {
+            "success": True,
+            "price": response.get('price'),
+            "postcode": postcode,
+            "service": service,
+            "type": type
+        }
+
+    return {"success": False, "message": "No pricing available"}
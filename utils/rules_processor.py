@@ -1,14 +1,42 @@
-import os
-import json
-import re
-import PyPDF2
-from typing import Dict, Any, List
+import threading
+from typing import Dict, Any, List, Set
 from pathlib import Path
+from utils.pdf_rules import load_pdf_text
+from utils.keyword_matcher import KeywordMatcher
+
+# (trigger phrase, exact script) - a response mentioning the phrase must use the script
+_SCRIPT_TRIGGERS = (
+    ("road", "permit_script"), ("permit", "permit_script"), ("council", "permit_script"),
+    ("8-yard", "mav_suggestion"), ("light materials", "mav_suggestion"),
+    ("6-wheeler", "grab_6_wheeler"), ("6 wheel", "grab_6_wheeler"),
+    ("8-wheeler", "grab_8_wheeler"), ("8 wheel", "grab_8_wheeler"),
+    ("heavy materials", "heavy_materials"), ("soil", "heavy_materials"), ("rubble", "heavy_materials"),
+    ("sofa", "sofa_prohibited"), ("upholstered", "sofa_prohibited"),
+)
+_SCRIPT_TRIGGER_MATCHER = KeywordMatcher(_SCRIPT_TRIGGERS)
 
 class RulesProcessor:
+    # Parsed rules per PDF path - shared by every instance in the process
+    _rules_cache: Dict[str, Dict[str, Any]] = {}
+    _rules_lock = threading.Lock()
+    
     def __init__(self):
         self.pdf_path = "data/rules/all rules.pdf"
-        self.rules_data = self._load_all_rules()
+        self.rules_data = self._get_cached_rules()
+        self._agent_rules: Dict[str, Dict[str, Any]] = {}
+        # Wrong phrases lowered once here and found in one pass per validation (tag = original phrase)
+        self._wrong_phrases = KeywordMatcher(
+            (correction["wrong"].lower(), correction["wrong"])
+            for correction in self.rules_data.get("testing_corrections", [])
+        )
+    
+    def _get_cached_rules(self) -> Dict[str, Any]:
+        """Parse the rules PDF once per process; later instances reuse the result"""
+        with self._rules_lock:
+            rules = self._rules_cache.get(self.pdf_path)
+            if rules is None:
+                rules = self._rules_cache[self.pdf_path] = self._load_all_rules()
+        return rules
     
     def _load_all_rules(self) -> Dict[str, Any]:
         """Load rules from PDF first, fallback to hardcoded if PDF not available"""
@@ -27,14 +55,8 @@ class RulesProcessor:
             if not Path(self.pdf_path).exists():
                 return ""
             
-            with open(self.pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                
-                return text
+            # Same parsed (and disk-cached) text the agents use
+            return load_pdf_text(self.pdf_path)
                 
         except Exception as e:
             print(f"Error reading PDF: {e}")
@@ -249,7 +271,17 @@ class RulesProcessor:
         }
     
     def get_rules_for_agent(self, agent_type: str) -> Dict[str, Any]:
-        """Get specific rules for an agent type"""
+        """Get specific rules for an agent type (built once per type)"""
+        rules = self._agent_rules.get(agent_type)
+        if rules is None:
+            rules = self._agent_rules[agent_type] = self._build_rules_for_agent(agent_type)
+        return rules
+
+    def get_rules_for_agents(self, agent_types: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Rules for several agent types in one dict, ready to serialize in a single pass"""
+        return {agent_type: self.get_rules_for_agent(agent_type) for agent_type in agent_types}
+
+    def _build_rules_for_agent(self, agent_type: str) -> Dict[str, Any]:
         base_rules = {
             **self.rules_data["lock_rules"],
             "office_hours": self.rules_data["office_hours"],
@@ -261,7 +293,7 @@ class RulesProcessor:
                 **base_rules,
                 **self.rules_data["skip_rules"],
                 "exact_scripts": {k: v for k, v in self.rules_data["exact_scripts"].items() 
-                                if k in ["heavy_materials", "sofa_prohibited", "permit_script", "mav_suggestion"]},
+                                if k in {"heavy_materials", "sofa_prohibited", "permit_script", "mav_suggestion"}},
                 "prohibited_items": self.rules_data["prohibited_items"],
                 "surcharge_rates": self.rules_data["surcharge_rates"]
             }
@@ -270,7 +302,7 @@ class RulesProcessor:
                 **base_rules,
                 **self.rules_data["mav_rules"],
                 "exact_scripts": {k: v for k, v in self.rules_data["exact_scripts"].items()
-                                if k in ["time_restriction", "sunday_collection"]},
+                                if k in {"time_restriction", "sunday_collection"}},
                 "surcharge_rates": self.rules_data["surcharge_rates"]
             }
         elif agent_type == "grab_hire":
@@ -278,7 +310,7 @@ class RulesProcessor:
                 **base_rules,
                 **self.rules_data["grab_rules"],
                 "exact_scripts": {k: v for k, v in self.rules_data["exact_scripts"].items()
-                                if k in ["grab_6_wheeler", "grab_8_wheeler"]}
+                                if k in {"grab_6_wheeler", "grab_8_wheeler"}}
             }
         elif agent_type == "pricing":
             return {
@@ -293,20 +325,22 @@ class RulesProcessor:
         """Validate agent response against business rules"""
         rules = self.get_rules_for_agent(agent_type)
         violations = []
+        # Lowered once - every phrase check below is case-insensitive
+        response_lower = response.lower()
         
         # Check for critical testing corrections
-        for correction in self.rules_data.get("testing_corrections", []):
-            if correction["wrong"].lower() in response.lower():
-                violations.append(f"CRITICAL: Used wrong phrase - {correction['wrong']}")
+        for _, wrong in self._wrong_phrases.matches(response_lower):
+            violations.append(f"CRITICAL: Used wrong phrase - {wrong}")
         
         # Check exact scripts
         if "exact_scripts" in rules:
+            triggered = self._triggered_scripts(response_lower)
             for script_name, script_text in rules["exact_scripts"].items():
-                if self._should_use_script(response, script_name) and script_text not in response:
+                if script_name in triggered and script_text not in response:
                     violations.append(f"Exact script not used for {script_name}")
         
         # Check VAT spelling
-        if "vat" in response.lower() and "v-a-t" not in response.lower():
+        if "vat" in response_lower and "v-a-t" not in response_lower:
             violations.append("VAT not spelled as V-A-T")
         
         # Check for bundled questions (LOCK 3)
@@ -321,16 +355,6 @@ class RulesProcessor:
             "rules_source": "PDF" if Path(self.pdf_path).exists() else "hardcoded"
         }
     
-    def _should_use_script(self, response: str, script_name: str) -> bool:
-        """Check if response should use specific exact script"""
-        triggers = {
-            "permit_script": ["road", "permit", "council"],
-            "mav_suggestion": ["8-yard", "light materials"],
-            "grab_6_wheeler": ["6-wheeler", "6 wheel"],
-            "grab_8_wheeler": ["8-wheeler", "8 wheel"],
-            "heavy_materials": ["heavy materials", "soil", "rubble"],
-            "sofa_prohibited": ["sofa", "upholstered"]
-        }
-        
-        script_triggers = triggers.get(script_name, [])
-        return any(trigger in response.lower() for trigger in script_triggers)
+    def _triggered_scripts(self, response_lower: str) -> Set[str]:
+        """Exact scripts a response (already lowercased) should use - one pass over the response"""
+        return _SCRIPT_TRIGGER_MATCHER.tags(response_lower)
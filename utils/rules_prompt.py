@@ -0,0 +1,19 @@
+from typing import Dict, Tuple
+from langchain.prompts import ChatPromptTemplate
+from utils.pdf_rules import rules_prompt_prefix
+
+# (rules text, system prompt, human template) -> built template, shared by every agent
+_PROMPTS: Dict[Tuple[str, str, str], ChatPromptTemplate] = {}
+
+def build_rules_prompt(pdf_rules: str, system_prompt: str, human_template: str) -> ChatPromptTemplate:
+    '''Functions-agent prompt with the shared rules block ahead of the agent's own
+    instructions - parsed once per distinct rules text and agent'''
+    key = (pdf_rules, system_prompt, human_template)
+    prompt = _PROMPTS.get(key)
+    if prompt is None:
+        prompt = _PROMPTS[key] = ChatPromptTemplate.from_messages([
+            ("system", rules_prompt_prefix(pdf_rules) + system_prompt),
+            ("human", human_template),
+            ("placeholder", "{agent_scratchpad}")
+        ])
+    return prompt
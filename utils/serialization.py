@@ -0,0 +1,20 @@
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def dumps(obj: Any) -> str:
+    '''Serialize to a compact JSON string - orjson when installed, stdlib json otherwise'''
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, default=str).decode()
+    return json.dumps(obj, default=str, separators=(',', ':'))
+
+def loads(data: Union[str, bytes]) -> Any:
+    '''Parse a JSON string or bytes'''
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
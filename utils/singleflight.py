@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+class SingleFlight:
+    '''Collapse concurrent calls with the same key into one call, and keep accepted
+    results for ttl seconds so repeat lookups skip the call entirely.
+
+    Callers waiting on an in-flight key get the leader's result (or exception).
+    '''
+
+    def __init__(self, ttl: float = 300.0, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._results: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+
+    def call(self, key: Hashable, fn: Callable[..., Any], *args,
+             cache_if: Optional[Callable[[Any], bool]] = None, **kwargs) -> Any:
+        '''Return fn(*args, **kwargs), shared with any identical call in flight or cached'''
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                if cached[0] > time.monotonic():
+                    return cached[1]
+                del self._results[key]
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            if self.ttl > 0 and (cache_if is None or cache_if(result)):
+                self._results[key] = (time.monotonic() + self.ttl, result)
+                self._results.move_to_end(key)
+                while len(self._results) > self.maxsize:
+                    self._results.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def peek(self, key: Hashable) -> Any:
+        '''Cached result for key, or None - never calls or waits'''
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+        return None
+
+    def clear(self):
+        '''Drop all cached results'''
+        with self._lock:
+            self._results.clear()
@@ -1,11 +1,14 @@
-import json
 import os
+import atexit
+import copy
 import sqlite3
+import threading
 from typing import Dict, Any, Optional, List
 from datetime import datetime
 from dataclasses import dataclass, field
+from utils.serialization import dumps, loads
 
-@dataclass
+@dataclass(slots=True)
 class ConversationState:
     conversation_id: str
     customer_data: Dict[str, Any] = field(default_factory=dict)
@@ -20,9 +23,23 @@ class ConversationState:
     updated_at: str = field(default_factory=lambda: datetime.now().isoformat())
 
 class StateManager:
-    def __init__(self, db_path: str = "data/conversations.db"):
+    def __init__(self, db_path: str = "data/conversations.db", flush_interval: float = 0.25, flush_batch_size: int = 50):
         self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        
+        # Write-behind buffer: the first save in a quiet period is written
+        # straight away, saves during the following window are coalesced
+        self._dirty: Dict[str, ConversationState] = {}
+        # States taken from the buffer stay readable here until their write commits
+        self._inflight: Dict[str, ConversationState] = {}
+        self._dirty_lock = threading.Lock()
+        # One writer at a time, so rows commit in the order states left the buffer
+        self._write_lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        
         self._init_db()
+        atexit.register(self.flush)
     
     def _init_db(self):
         '''Initialize state database'''
@@ -51,7 +68,12 @@ class StateManager:
         conn.close()
     
     def get_state(self, conversation_id: str) -> ConversationState:
-        '''Get conversation state'''
+        '''Get conversation state - a copy, so edits need save_state whether or not it is still buffered'''
+        with self._dirty_lock:
+            pending = self._dirty.get(conversation_id) or self._inflight.get(conversation_id)
+            if pending is not None:
+                return copy.deepcopy(pending)
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -62,46 +84,107 @@ class StateManager:
         if row:
             return ConversationState(
                 conversation_id=row[0],
-                customer_data=json.loads(row[1]) if row[1] else {},
-                active_services=json.loads(row[2]) if row[2] else [],
+                customer_data=loads(row[1]) if row[1] else {},
+                active_services=loads(row[2]) if row[2] else [],
                 current_agent=row[3],
                 office_hours_checked=bool(row[4]),
                 pricing_given=bool(row[5]),
                 booking_ref=row[6],
                 conversation_stage=row[7] or "initial",
-                business_rules_applied=json.loads(row[8]) if row[8] else [],
+                business_rules_applied=loads(row[8]) if row[8] else [],
                 created_at=row[9],
                 updated_at=row[10]
             )
         else:
             return ConversationState(conversation_id=conversation_id)
     
-    def save_state(self, state: ConversationState):
-        '''Save conversation state'''
+    def save_state(self, state: ConversationState, durable: bool = False):
+        '''Save conversation state - buffered unless durable or first in a quiet period'''
         state.updated_at = datetime.now().isoformat()
         
+        with self._dirty_lock:
+            self._dirty[state.conversation_id] = copy.deepcopy(state)
+            if durable or self._flush_timer is None:
+                only = state.conversation_id
+                if not durable:
+                    self._start_flush_timer()
+            elif len(self._dirty) < self.flush_batch_size:
+                return
+            else:
+                only = None
+        
+        self._write_pending(only)
+    
+    def flush(self):
+        '''Write all buffered states to the database'''
+        self._write_pending()
+    
+    def _start_flush_timer(self):
+        '''Open a batching window - caller must hold _dirty_lock'''
+        self._flush_timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+    
+    def _flush_on_timer(self):
+        '''Flush buffered states; keep the window open while writes keep arriving'''
+        with self._dirty_lock:
+            if not self._dirty:
+                self._flush_timer = None
+                return
+            self._start_flush_timer()
+        self._write_pending()
+    
+    def _write_pending(self, conversation_id: Optional[str] = None):
+        '''Write buffered states (all, or just conversation_id's) - in flight until committed'''
+        with self._write_lock:
+            with self._dirty_lock:
+                if conversation_id is None:
+                    batch, self._dirty = self._dirty, {}
+                elif conversation_id in self._dirty:
+                    batch = {conversation_id: self._dirty.pop(conversation_id)}
+                else:
+                    return  # already written by another flush
+                self._inflight.update(batch)
+            
+            try:
+                self._write_states(list(batch.values()))
+            except Exception:
+                with self._dirty_lock:
+                    for key, state in batch.items():
+                        self._dirty.setdefault(key, state)  # retried on the next flush unless saved again
+                raise
+            finally:
+                with self._dirty_lock:
+                    for key in batch:
+                        del self._inflight[key]
+    
+    def _write_states(self, states: List[ConversationState]):
+        '''Write states to the database in a single transaction'''
+        if not states:
+            return
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute('''
+        cursor.executemany('''
             INSERT OR REPLACE INTO conversation_states 
             (conversation_id, customer_data, active_services, current_agent, 
              office_hours_checked, pricing_given, booking_ref, conversation_stage,
              business_rules_applied, created_at, updated_at)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        ''', [(
             state.conversation_id,
-            json.dumps(state.customer_data),
-            json.dumps(state.active_services),
+            dumps(state.customer_data),
+            dumps(state.active_services),
             state.current_agent,
             state.office_hours_checked,
             state.pricing_given,
             state.booking_ref,
             state.conversation_stage,
-            json.dumps(state.business_rules_applied),
+            dumps(state.business_rules_applied),
             state.created_at,
             state.updated_at
-        ))
+        ) for state in states])
         
         conn.commit()
         conn.close()
@@ -109,6 +192,8 @@ class StateManager:
     def update_customer_data(self, conversation_id: str, field: str, value: Any):
         '''Update specific customer data field'''
         state = self.get_state(conversation_id)
+        if field in state.customer_data and state.customer_data[field] == value:
+            return
         state.customer_data[field] = value
         self.save_state(state)
     
@@ -122,26 +207,30 @@ class StateManager:
     def set_current_agent(self, conversation_id: str, agent: str):
         '''Set current agent'''
         state = self.get_state(conversation_id)
-        state.current_agent = agent
-        self.save_state(state)
+        if state.current_agent != agent:
+            state.current_agent = agent
+            self.save_state(state)
     
     def mark_office_hours_checked(self, conversation_id: str):
         '''Mark office hours as checked'''
         state = self.get_state(conversation_id)
-        state.office_hours_checked = True
-        self.save_state(state)
+        if not state.office_hours_checked:
+            state.office_hours_checked = True
+            self.save_state(state)
     
     def mark_pricing_given(self, conversation_id: str):
         '''Mark pricing as given'''
         state = self.get_state(conversation_id)
-        state.pricing_given = True
-        self.save_state(state)
+        if not state.pricing_given:
+            state.pricing_given = True
+            self.save_state(state)
     
     def set_booking_ref(self, conversation_id: str, booking_ref: str):
         '''Set booking reference'''
         state = self.get_state(conversation_id)
-        state.booking_ref = booking_ref
-        self.save_state(state)
+        if state.booking_ref != booking_ref:
+            state.booking_ref = booking_ref
+            self.save_state(state, durable=True)
     
     def add_business_rule_applied(self, conversation_id: str, rule: str):
         '''Add business rule to applied list'''